@@ -0,0 +1,234 @@
+import collections
+import json
+import os
+import socketserver
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ChangeIndex:
+    # key -> sequence number of its last change, kept in change order so a
+    # "changed since cursor" query only walks back over what the client missed.
+    # With a limit, the keys unchanged for longest are dropped first.
+    def __init__(self, limit=None):
+        self.seqs = collections.OrderedDict()
+        self.limit = limit
+
+    def touch(self, key, seq):
+        self.seqs[key] = seq
+        self.seqs.move_to_end(key)
+        if self.limit and len(self.seqs) > self.limit: self.seqs.popitem(last=False)
+
+    def since(self, cursor, limit):
+        # Oldest change first: ([(seq, key), ...] at most limit, more waiting?)
+        found = []
+        for key in reversed(self.seqs):
+            seq = self.seqs[key]
+            if seq <= cursor: break
+            found.append((seq, key))
+        found.reverse()
+        return found[:limit], len(found) > limit
+
+    def __len__(self):
+        return len(self.seqs)
+
+
+class ChangeFeed:
+    # Sensor listener that numbers every change for the query API. Devices and
+    # locations are indexed by their last change (a client always gets their
+    # current state); console lines, hostname answers and flow records go to a
+    # bounded ring, and a client whose cursor fell off it is told to reset.
+    # Sequence numbers restart with the process; `instance` tells them apart.
+    def __init__(self, max_events=10000, max_locations=None):
+        self.instance = os.urandom(8).hex()
+        self.seq = 0
+        self.devices = ChangeIndex()
+        self.locations = ChangeIndex(max_locations) # the sensor keeps at most as many locations
+        self.events = collections.deque(maxlen=max_events) # (seq, event dict)
+        self.evicted = 0 # seq of the newest event pushed out of the ring
+        self.lock = threading.Lock()
+
+    def __call__(self, kind, *args):
+        with self.lock:
+            self.seq += 1
+            if kind == "device": self.devices.touch(args[0], self.seq)
+            elif kind == "location": self.locations.touch(args[0], self.seq)
+            else:
+                if kind == "log": event = {'message': args[0], 'ip': args[1], 'host_ip': args[2]}
+                elif kind == "hostname": event = {'ip': args[0], 'name': args[1]}
+                elif kind == "flows": event = {'records': args[0]}
+                else: return
+                if len(self.events) == self.events.maxlen: self.evicted = self.events[0][0]
+                event.update(seq=self.seq, kind=kind, time=time.time())
+                self.events.append((self.seq, event))
+
+    def changed_devices(self, cursor, limit):
+        with self.lock: return self.devices.since(cursor, limit)
+
+    def changed_locations(self, cursor, limit):
+        with self.lock: return self.locations.since(cursor, limit)
+
+    def events_since(self, cursor, limit):
+        # ([event, ...] oldest first, more waiting?, reset?)
+        with self.lock:
+            found = []
+            for seq, event in reversed(self.events):
+                if seq <= cursor: break
+                found.append(event)
+            reset = cursor < self.evicted
+        found.reverse()
+        return found[:limit], len(found) > limit, reset
+
+    def stats(self):
+        with self.lock:
+            return {'seq': self.seq, 'devices': len(self.devices), 'locations': len(self.locations),
+                    'events': len(self.events), 'evicted_seq': self.evicted}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "NETSCAN"
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        try: status, body = self.server.api.route(method, url.path.rstrip("/") or "/", query)
+        except ValueError as e: status, body = 400, {'error': str(e)}
+        except Exception as e: status, body = 500, {'error': str(e)}
+        if isinstance(body, str):
+            data, ctype = body.encode(), "text/plain; version=0.0.4"
+        else:
+            data, ctype = json.dumps(body).encode(), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ApiServer:
+    # Local read API over a Sensor and its ChangeFeed (stdlib HTTP, on a TCP
+    # port or a Unix socket). Lists are paginated by change sequence: pass the
+    # returned `cursor` as `since` until `more` is false, then keep polling with
+    # it to get only what changed.
+    #   GET  /status                               capture state (and whether Scapy is loaded yet), engine stats, current seq
+    #   GET  /devices?since=&limit=&activities=    devices changed after `since` (activities = newest N each)
+    # Pages carry the feed's `instance`: cursors from another instance (a restarted daemon) are meaningless.
+    #   GET  /devices/<ip>?activities=             one device with its activity history
+    #   GET  /locations?since=&limit=              geolocated destinations
+    #   GET  /events?since=&limit=                 console lines, hostname answers, flow records
+    #   GET  /metrics                              Prometheus text (when metrics are enabled)
+    #   POST /capture/start, /capture/stop
+    def __init__(self, sensor, feed, listen="127.0.0.1:8765", page_size=500):
+        self.sensor = sensor
+        self.feed = feed
+        self.listen = listen
+        self.page_size = page_size
+        self.server = None
+        self.requests = 0
+
+    def start(self):
+        if self.listen.startswith("unix:"):
+            path = self.listen[5:]
+            if os.path.exists(path): os.unlink(path) # Stale socket from an unclean exit
+            self.server = _UnixHTTPServer(path, _Handler)
+        else:
+            host, _, port = self.listen.rpartition(":")
+            self.server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), _Handler)
+        self.server.api = self
+        threading.Thread(target=self.server.serve_forever, name="api", daemon=True).start()
+        return self
+
+    def stop(self):
+        if not self.server: return
+        self.server.shutdown()
+        self.server.server_close()
+        if self.listen.startswith("unix:"):
+            try: os.unlink(self.listen[5:])
+            except OSError: pass
+        self.server = None
+
+    def address(self):
+        if self.listen.startswith("unix:"): return self.listen
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _int(self, query, name, default, upper=None):
+        try: value = int(query.get(name, default))
+        except ValueError: raise ValueError(f"{name} must be an integer")
+        if value < 0: raise ValueError(f"{name} must not be negative")
+        return min(value, upper) if upper else value
+
+    def _page(self, found, more, cursor, items):
+        return {'items': items, 'cursor': found[-1][0] if found else cursor, 'more': more, 'seq': self.feed.seq,
+                'instance': self.feed.instance}
+
+    def device_record(self, ip, activities=0):
+        engine = self.sensor.engine
+        with engine.lock:
+            dev = engine.devices.get(ip)
+            if dev is None: return None
+            now = engine.now()
+            record = {'ip': ip, 'name': dev.name, 'risk': round(engine.risk.risk(ip, now), 4), 'version': dev.version,
+                      'activity_count': len(dev.activities), 'dropped_activities': dev.dropped,
+                      'per_minute': engine.rates(dev.rates, now)}
+            if activities != 0: # None: the whole history
+                record['activities'] = [{'activity': a, 'first_seen': r.first_seen, 'last_seen': r.last_seen, 'hits': r.hits}
+                                        for a, r in dev.recent(activities)]
+        return record
+
+    def route(self, method, path, query):
+        self.requests += 1
+        sensor = self.sensor
+        if method == "POST":
+            if path == "/capture/start": sensor.start_capture()
+            elif path == "/capture/stop": sensor.stop_capture()
+            else: return 404, {'error': "not found"}
+            return 200, {'capturing': sensor.capturing}
+        if method != "GET": return 405, {'error': "method not allowed"}
+
+        if path == "/status":
+            return 200, {'capturing': sensor.capturing, 'capture_ready': sensor.capture_ready.is_set(), 'seq': self.feed.seq,
+                         'instance': self.feed.instance, 'max_risk': sensor.engine.max_risk(),
+                         'engine': sensor.engine.stats(), 'feed': self.feed.stats(), 'api_requests': self.requests}
+        if path == "/devices":
+            cursor = self._int(query, "since", 0)
+            activities = self._int(query, "activities", 0)
+            found, more = self.feed.changed_devices(cursor, self._int(query, "limit", self.page_size, self.page_size) or 1)
+            items = [r for r in (self.device_record(ip, activities) for _, ip in found) if r]
+            return 200, self._page(found, more, cursor, items)
+        if path.startswith("/devices/"):
+            record = self.device_record(urllib.parse.unquote(path[9:]), self._int(query, "activities", 0) or None)
+            if record is None: return 404, {'error': "unknown device"}
+            return 200, record
+        if path == "/locations":
+            cursor = self._int(query, "since", 0)
+            found, more = self.feed.changed_locations(cursor, self._int(query, "limit", self.page_size, self.page_size) or 1)
+            items = []
+            for _, ip in found:
+                loc = sensor.locations.get(ip)
+                if loc: items.append({'ip': ip, 'lat': loc[0], 'lon': loc[1], 'city': loc[2]})
+            return 200, self._page(found, more, cursor, items)
+        if path == "/events":
+            cursor = self._int(query, "since", 0)
+            events, more, reset = self.feed.events_since(cursor, self._int(query, "limit", self.page_size, self.page_size) or 1)
+            return 200, {'items': events, 'cursor': events[-1]['seq'] if events else cursor, 'more': more,
+                         'reset': reset, 'seq': self.feed.seq, 'instance': self.feed.instance}
+        if path == "/metrics":
+            if not sensor.metrics.enabled: return 404, {'error': "metrics are disabled"}
+            return 200, sensor.metrics.prometheus()
+        return 404, {'error': "not found"}
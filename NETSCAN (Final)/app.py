@@ -1,11 +1,14 @@
+import argparse
+import sys
 import threading
 import tkinter as tk
 import customtkinter as ctk
-import tkintermapview
-import requests
-import socket
-from scapy.all import sniff, conf
-import datetime
+import time
+import collections
+from log_view import LogConsole
+from map_layer import MarkerLayer
+from metrics import MetricsRegistry
+from settings import SETTINGS
 
 # --- DESIGN SYSTEM ---
 COLORS = {
@@ -36,12 +39,17 @@ UI_STYLE = {
     "border_width": 2
 }
 
+def format_seconds(value):
+    if value == float("inf"): return "> 1 s"
+    if value >= 1e-3: return f"{value * 1e3:.1f} ms"
+    return f"{value * 1e6:.0f} us"
+
 # Set the appearance and theme
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
 class NetworkInsecurityApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup_probe=False):
         super().__init__()
 
         self.title("NETSCAN // NETWORK VISIBILITY PROTOTYPE")
@@ -53,16 +61,44 @@ class NetworkInsecurityApp(ctk.CTk):
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         # Data structures
-        self.discovered_devices = {}  # IP -> { 'activities': [], 'risk': 0.0, 'name': None }
         self.device_buttons = {}      # IP -> Button Object
-        self.ip_to_location = {}       # IP -> (lat, lon, city)
+        self.device_labels = {}       # IP -> name currently shown on its button
         self.selected_device = None
-        self.ip_to_hostname = {}      # Cache for reverse DNS
-        self.city_markers = {}        # city -> { 'marker': marker_obj, 'count': N }
+        self.dst_volume = {}          # external IP -> flow bytes waiting for its geolocation
         self.new_markers_count = 0
-        self.lookup_lock = threading.Lock()
-        self.pending_lookups = set()
-        self.last_activity_seen = {} # (ip, activity) -> timestamp
+
+        # UI event queue: worker threads append, render_tick applies everything on the Tk thread
+        self.ui_events = collections.deque()
+        self.ui_pending = set() # (kind, *args) of device/hostname updates already queued
+        self.risk_dirty = False
+        self.risk_refreshed = 0.0
+        self.shown_risk = None
+        self.button_colors = {} # IP -> risk colour currently on its button border
+
+        # Performance metrics, shared with the Sensor (see sensor.py)
+        self.metrics = MetricsRegistry(enabled=SETTINGS["metrics"]["enabled"])
+        self.tick_latency = self.metrics.histogram("ui_render_tick")
+        self.ui_applied = self.metrics.counter("ui_events")
+        self.ui_coalesced = self.metrics.counter("ui_events_coalesced")
+        self.ui_dropped = self.metrics.counter("ui_log_dropped")
+        self.metrics.collect("ui", lambda: {'backlog': len(self.ui_events)})
+
+        # Capture + analysis run in a Sensor (or in a daemon the UI attaches to); the UI only renders its events.
+        # It is built on a worker thread once the landing screen is painted; events queue in ui_events until then.
+        self.sensor = None
+        self.booted_sensor = None
+        self.sensor_failed = False
+        self.engine = None
+        self.discovered_devices = {} # IP -> devices.Device (the engine's dict once the sensor is up)
+        self.ip_to_location = {}     # IP -> (lat, lon, city)
+        self.detail_rendered = None # (ip, version) currently drawn in the detail view
+        self.stats_window = None
+        self.main_container = None  # Dashboard, built when the scan is first started
+        self.map_widget = None      # Map view, built when it is first shown
+        self.startup_probe = startup_probe
+        self.painted = False
+        self.paint_binding = self.bind("<Expose>", self.on_first_paint, add="+")
+        self.after(1000, self.on_first_paint) # In case no Expose arrives (e.g. a minimized start)
 
         # --- Landing Screen ---
         self.landing_frame = ctk.CTkFrame(self, fg_color=COLORS["bg_dark"], corner_radius=0)
@@ -111,7 +147,58 @@ class NetworkInsecurityApp(ctk.CTk):
                                       text_color=COLORS["text_secondary"], justify="center")
         self.desc_label.pack(pady=40)
 
-        # --- Dashboard (Initially Hidden) ---
+    def on_first_paint(self, event=None):
+        if self.painted: return
+        self.painted = True
+        self.unbind("<Expose>", self.paint_binding)
+        if self.startup_probe: print("paint", flush=True)
+        threading.Thread(target=self.start_sensor, name="sensor-init", daemon=True).start()
+        self.after(20, self.wait_for_sensor)
+
+    def start_sensor(self):
+        # Worker thread: caches, domain lists and the session restore never hold up the window,
+        # and the Sensor itself imports Scapy in the background
+        listener = self.on_sensor_event
+        try:
+            if SETTINGS["attach"]:
+                from remote import RemoteSensor
+                sensor = RemoteSensor(SETTINGS["attach"], listener=listener, metrics=self.metrics,
+                                      activities=SETTINGS["detail_max_activities"], half_life=SETTINGS["risk"]["half_life"],
+                                      max_locations=SETTINGS["geo_cache"]["max_entries"])
+            else:
+                from sensor import Sensor
+                sensor = Sensor(SETTINGS, listener=listener, metrics=self.metrics)
+        except Exception as e:
+            self.post_ui(self.add_log, f"ERROR: {str(e)}")
+            self.sensor_failed = True
+            return
+        if not self.running: sensor.close() # Window closed while it was starting
+        else: self.booted_sensor = sensor
+
+    def wait_for_sensor(self):
+        if not self.running: return
+        if self.sensor_failed: # Stop polling; the error is in the log
+            if self.startup_probe: self.on_closing()
+            return
+        if self.booted_sensor is None:
+            self.after(20, self.wait_for_sensor)
+            return
+        self.sensor = self.booted_sensor
+        self.engine = self.sensor.engine
+        self.discovered_devices = self.engine.devices
+        self.ip_to_location = self.sensor.locations
+        if self.is_sniffing: self.sensor.start_capture() # Scan was started before the sensor was up
+        if self.startup_probe: self.report_capture_ready()
+
+    def report_capture_ready(self):
+        # bench.py startup: the parent timestamps each milestone line, then the app exits
+        if not self.sensor.capture_ready.is_set():
+            self.after(10, self.report_capture_ready)
+            return
+        print("capture_ready", flush=True)
+        self.on_closing()
+
+    def build_dashboard(self):
         self.main_container = ctk.CTkFrame(self, fg_color=COLORS["bg_dark"], corner_radius=0)
         
         self.main_container.grid_columnconfigure(2, weight=1)
@@ -165,6 +252,14 @@ class NetworkInsecurityApp(ctk.CTk):
                                          command=lambda: self.show_view("map"))
         self.btn_rail_map.grid(row=6, column=0, padx=15, pady=10)
 
+        self.btn_rail_stats = ctk.CTkButton(self.nav_rail, text="📊", 
+                                           width=60, height=60, corner_radius=UI_STYLE["btn_radius"],
+                                           fg_color="transparent", text_color=COLORS["text_secondary"],
+                                           hover_color=COLORS["border"], anchor="center",
+                                           font=("Segoe UI Emoji", 22),
+                                           command=self.toggle_stats_panel)
+        if SETTINGS["metrics"]["enabled"]: self.btn_rail_stats.grid(row=8, column=0, padx=15, pady=(10, 20))
+
         # Notification Dot for Map (Small circular frame for better rendering)
         self.map_dot = ctk.CTkFrame(self.nav_rail, width=10, height=10, 
                                    corner_radius=5, fg_color=COLORS["accent"], 
@@ -231,28 +326,8 @@ class NetworkInsecurityApp(ctk.CTk):
 
         self.current_view = "flow"
 
-        # View: Global Traffic Map
-        self.map_view = ctk.CTkFrame(self.view_container, fg_color=COLORS["bg_card"], corner_radius=UI_STYLE["radius"])
-        self.map_view.grid_columnconfigure(0, weight=1)
-        self.map_view.grid_rowconfigure(0, weight=1)
-        self.map_view.grid(row=0, column=0, sticky="nsew") # Stack on same grid
-
-        self.map_widget = tkintermapview.TkinterMapView(self.map_view, corner_radius=UI_STYLE["radius"])
-        self.map_widget.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.map_widget.set_zoom(2)
-
-        # Map Controls Overlay
-        self.map_controls = ctk.CTkFrame(self.map_view, fg_color=COLORS["bg_dark"], corner_radius=UI_STYLE["radius"], border_width=1, border_color=COLORS["border"])
-        self.map_controls.place(relx=0.97, rely=0.03, anchor="ne")
-        
-        self.controls_label = ctk.CTkLabel(self.map_controls, text="MAP OVERLAYS", font=ctk.CTkFont(size=10, weight="bold"), text_color=COLORS["text_secondary"])
-        self.controls_label.pack(side="top", padx=15, pady=(8, 0), anchor="w")
-
-        self.show_names_var = ctk.BooleanVar(value=True)
-        self.names_toggle = ctk.CTkSwitch(self.map_controls, text="Node Names", variable=self.show_names_var, 
-                                         command=self.toggle_marker_names, font=ctk.CTkFont(size=11),
-                                         progress_color=COLORS["accent"])
-        self.names_toggle.pack(side="top", padx=15, pady=(10, 15), anchor="w")
+        # View: Global Traffic Map (widgets built on first use; markers are modelled from the start)
+        self.map_layer = MarkerLayer(None, on_click=self.marker_callback, cell_px=SETTINGS["map_cluster_px"])
 
         # View: Data Flow
         self.flow_view = ctk.CTkFrame(self.view_container, fg_color=COLORS["bg_card"], corner_radius=UI_STYLE["radius"])
@@ -271,9 +346,13 @@ class NetworkInsecurityApp(ctk.CTk):
         self.feed_frame.grid(row=0, column=0, sticky="nsew", pady=(0, 10))
         self.feed_frame.grid_rowconfigure(1, weight=1)
         self.feed_frame.grid_columnconfigure(0, weight=1)
-        self.log_textbox = ctk.CTkTextbox(self.feed_frame, font=FONTS["mono"], fg_color="transparent")
+        self.log_textbox = ctk.CTkTextbox(self.feed_frame, font=FONTS["mono"], fg_color="transparent",
+                                          wrap="none", activate_scrollbars=False)
         self.log_textbox.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
         self.log_textbox.configure(state="disabled")
+        self.log_console = LogConsole(self.log_textbox, on_select=self.select_device, capacity=SETTINGS["log_capacity"])
+        self.metrics.collect("log", self.log_console.stats)
+        self.metrics.collect("map", self.map_layer.stats)
 
         self.detail_frame = ctk.CTkFrame(self.flow_container, fg_color=COLORS["bg_dark"], corner_radius=UI_STYLE["radius"])
         self.detail_frame.grid_rowconfigure(1, weight=1)
@@ -292,8 +371,33 @@ class NetworkInsecurityApp(ctk.CTk):
             box.tag_config("info", foreground="#60A5FA") # Blueish
             box.tag_config("normal", foreground=COLORS["text_primary"])
 
-        # Start auto-clear timer (5 mins)
-        self.after(300000, self.perform_auto_clear)
+        self.after(SETTINGS["ui_tick_ms"], self.render_tick)
+        self.after(SETTINGS["map_flush_ms"], self.map_tick)
+
+    def build_map_view(self):
+        import tkintermapview # Heavy import (tiles, PIL, requests): only once the map is opened
+        self.map_view = ctk.CTkFrame(self.view_container, fg_color=COLORS["bg_card"], corner_radius=UI_STYLE["radius"])
+        self.map_view.grid_columnconfigure(0, weight=1)
+        self.map_view.grid_rowconfigure(0, weight=1)
+        self.map_view.grid(row=0, column=0, sticky="nsew") # Stack on same grid
+
+        self.map_widget = tkintermapview.TkinterMapView(self.map_view, corner_radius=UI_STYLE["radius"])
+        self.map_widget.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.map_widget.set_zoom(2)
+        self.map_layer.map_widget = self.map_widget
+
+        # Map Controls Overlay
+        self.map_controls = ctk.CTkFrame(self.map_view, fg_color=COLORS["bg_dark"], corner_radius=UI_STYLE["radius"], border_width=1, border_color=COLORS["border"])
+        self.map_controls.place(relx=0.97, rely=0.03, anchor="ne")
+        
+        self.controls_label = ctk.CTkLabel(self.map_controls, text="MAP OVERLAYS", font=ctk.CTkFont(size=10, weight="bold"), text_color=COLORS["text_secondary"])
+        self.controls_label.pack(side="top", padx=15, pady=(8, 0), anchor="w")
+
+        self.show_names_var = ctk.BooleanVar(value=True)
+        self.names_toggle = ctk.CTkSwitch(self.map_controls, text="Node Names", variable=self.show_names_var, 
+                                         command=self.toggle_marker_names, font=ctk.CTkFont(size=11),
+                                         progress_color=COLORS["accent"])
+        self.names_toggle.pack(side="top", padx=15, pady=(10, 15), anchor="w")
 
     def center_window(self, width, height):
         self.update_idletasks()
@@ -303,83 +407,45 @@ class NetworkInsecurityApp(ctk.CTk):
 
     def enter_app(self):
         # Swap the content frames
+        if self.main_container is None: self.build_dashboard()
         self.landing_frame.place_forget()
         self.main_container.place(relx=0, rely=0, relwidth=1, relheight=1)
         
-        # Start scanning
+        # Start scanning (or as soon as the sensor is up)
         self.is_sniffing = True
-        threading.Thread(target=self.start_sniffing, daemon=True).start()
+        if self.sensor: self.sensor.start_capture()
 
     def toggle_marker_names(self):
-        show = self.show_names_var.get()
-        for city_data in self.city_markers.values():
-            marker = city_data['marker']
-            if not show:
-                # Store text if not already stored, then clear it
-                if not hasattr(marker, 'original_text') or marker.original_text == "":
-                    marker.original_text = marker.text
-                marker.set_text("")
-            else:
-                # Restore text from storage
-                if hasattr(marker, 'original_text'):
-                    marker.set_text(marker.original_text)
-        
-        # The labels will update automatically via set_text
+        self.map_layer.set_show_names(self.show_names_var.get())
+        self.map_layer.flush()
 
-    def geolocate_ip(self, ip):
-        with self.lookup_lock:
-            if ip in self.ip_to_location or ip in self.pending_lookups:
-                return
-            self.pending_lookups.add(ip)
-        
-        try:
-            # Check local IP ranges again
-            if ip.startswith(("10.", "192.168.", "172.16.", "127.")):
-                return
-
-            response = requests.get(f"http://ip-api.com/json/{ip}?fields=status,city,lat,lon", timeout=2).json()
-            if response.get("status") == "success":
-                lat, lon, city = response["lat"], response["lon"], response["city"]
-                self.ip_to_location[ip] = (lat, lon, city)
-                
-                # Update Map UI safely
-                self.after(10, lambda: self.update_map_marker(lat, lon, city, ip))
-        except: pass
-        finally:
-            with self.lookup_lock:
-                if ip in self.pending_lookups:
-                    self.pending_lookups.remove(ip)
-
-    def update_map_marker(self, lat, lon, city, ip):
-        if city in self.city_markers:
-            self.city_markers[city]['count'] += 1
-            count = self.city_markers[city]['count']
-            new_text = f"{city} ({count} Nodes)"
-            marker = self.city_markers[city]['marker']
-            marker.original_text = new_text
-            if self.show_names_var.get(): marker.set_text(new_text)
-        else:
-            text = f"{city} ({ip})"
-            marker = self.map_widget.set_marker(lat, lon, text=text if self.show_names_var.get() else "", command=self.marker_callback)
-            marker.original_text = text
-            self.city_markers[city] = {'marker': marker, 'count': 1}
-        
+    def update_map_marker(self, ip, lat, lon, city):
+        # Model update only; map_tick draws the markers
+        self.map_layer.add_node(lat, lon, city, ip)
+        self.map_layer.add_volume(city, self.dst_volume.pop(ip, 0))
         if self.current_view != "map":
             self.new_markers_count += 1
             self.update_nav_badges()
 
-    def should_process(self, ip, activity, interval=2.0):
-        now = datetime.datetime.now().timestamp()
-        key = (ip, activity)
-        if key in self.last_activity_seen and (now - self.last_activity_seen[key] < interval):
-            return False
-        self.last_activity_seen[key] = now
-        return True
+    def add_flow_volume(self, records):
+        # Aggregated flow records -> per-city traffic volume on the map markers
+        for record in records:
+            location = self.ip_to_location.get(record['dst'])
+            if location and self.map_layer.add_volume(location[2], record['bytes']): continue
+            if len(self.dst_volume) < 10000: # Not geolocated (or not drawn) yet
+                self.dst_volume[record['dst']] = self.dst_volume.get(record['dst'], 0) + record['bytes']
+
+    def map_tick(self):
+        if not self.running: return
+        if self.current_view == "map": self.map_layer.flush()
+        self.after(SETTINGS["map_flush_ms"], self.map_tick)
 
     def show_view(self, view_name):
         self.current_view = view_name
         if view_name == "map":
+            if self.map_widget is None: self.build_map_view()
             self.map_view.lift()
+            self.map_layer.flush()
             self.btn_rail_map.configure(fg_color=COLORS["accent"], text_color="white")
             self.btn_rail_flow.configure(fg_color="transparent", text_color=COLORS["text_secondary"])
             self.new_markers_count = 0
@@ -429,28 +495,110 @@ class NetworkInsecurityApp(ctk.CTk):
             self.scan_button.configure(text_color=color, border_color=color)
             self.btn_rail_power.configure(text_color=color, border_color=color)
             self.status_label.configure(text="STATUS: ACTIVE", text_color=color)
-            threading.Thread(target=self.start_sniffing, daemon=True).start()
+            if self.sensor: self.sensor.start_capture()
         else:
             self.is_sniffing = False
             color = COLORS["danger"]
             self.scan_button.configure(text_color=color, border_color=color)
             self.btn_rail_power.configure(text_color=color, border_color=color)
             self.status_label.configure(text="STATUS: IDLE", text_color="gray")
+            if self.sensor: self.sensor.stop_capture()
 
     def on_closing(self):
         self.running = False
         self.is_sniffing = False
+        sensor = self.sensor or self.booted_sensor # Built but not yet promoted by wait_for_sensor
+        if sensor: sensor.close()
         self.destroy()
 
-    def get_hostname(self, ip):
-        if ip in self.ip_to_hostname: return self.ip_to_hostname[ip]
-        try:
-            name = socket.gethostbyaddr(ip)[0]
-            self.ip_to_hostname[ip] = name
-            return name
-        except:
-            self.ip_to_hostname[ip] = ip
-            return ip
+    def on_engine_event(self, kind, *args):
+        if kind == "log": self.add_log(*args)
+        elif kind == "device": self.update_devices(*args)
+        elif kind == "hostname": self.log_console.rename_host(*args)
+        elif kind == "flows": self.add_flow_volume(*args)
+        elif kind == "location": self.update_map_marker(*args)
+
+    def on_sensor_event(self, kind, *args):
+        # Sensor threads. A device or hostname update already waiting for the tick is not queued
+        # again (it is applied with the latest state), and log lines past ui_max_backlog are dropped
+        if kind in ("device", "hostname"): self.post_ui_once((kind, *args), self.on_engine_event, kind, *args)
+        elif kind == "log" and len(self.ui_events) >= SETTINGS["ui_max_backlog"]: self.ui_dropped.inc()
+        else: self.post_ui(self.on_engine_event, kind, *args)
+
+    def post_ui(self, fn, *args):
+        # Thread-safe: deque appends need no lock, and nothing touches Tk until the next tick
+        self.ui_events.append((fn, args))
+
+    def post_ui_once(self, key, fn, *args):
+        if key in self.ui_pending:
+            self.ui_coalesced.inc()
+            return
+        self.ui_pending.add(key)
+        self.ui_events.append((self.apply_pending, (key, fn, args)))
+
+    def apply_pending(self, key, fn, args):
+        self.ui_pending.discard(key) # Before applying, so a change made meanwhile queues a fresh update
+        fn(*args)
+
+    def render_tick(self):
+        if not self.running: return
+        start = time.perf_counter()
+        # Events wait until the sensor is promoted: restored devices are not in discovered_devices before that
+        ready = self.sensor is not None or self.sensor_failed
+        pending = min(len(self.ui_events), SETTINGS["ui_max_events_per_tick"]) if ready else 0
+        self.ui_applied.inc(pending)
+        for _ in range(pending):
+            fn, args = self.ui_events.popleft()
+            try: fn(*args)
+            except Exception: pass
+        self.log_console.render() # One redraw of the visible rows per tick
+        if self.risk_dirty or start - self.risk_refreshed >= 1.0: # Once per tick with changes, and once a second as risk decays
+            self.risk_dirty = False
+            self.risk_refreshed = start
+            self.update_global_risk()
+            self.refresh_risk_colors()
+            self.refresh_detail_view()
+        self.tick_latency.observe(time.perf_counter() - start)
+        self.after(SETTINGS["ui_tick_ms"], self.render_tick)
+
+    def toggle_stats_panel(self):
+        if self.stats_window and self.stats_window.winfo_exists():
+            self.stats_window.destroy()
+            self.stats_window = None
+            return
+        self.stats_window = ctk.CTkToplevel(self, fg_color=COLORS["bg_dark"])
+        self.stats_window.title("NETSCAN // PERFORMANCE")
+        self.stats_window.geometry("560x680")
+        self.stats_box = ctk.CTkTextbox(self.stats_window, font=FONTS["mono"], fg_color=COLORS["bg_card"],
+                                        text_color=COLORS["text_primary"], wrap="none")
+        self.stats_box.pack(fill="both", expand=True, padx=10, pady=10)
+        self.stats_previous = None
+        self.refresh_stats_panel()
+
+    def refresh_stats_panel(self):
+        if not self.running or not self.stats_window or not self.stats_window.winfo_exists(): return
+        snap = self.metrics.snapshot()
+        gauges = snap['gauges']
+        frames = gauges.get("analysis_frames", 0)
+        rate = 0.0
+        if self.stats_previous:
+            elapsed = snap['time'] - self.stats_previous[0]
+            if elapsed > 0: rate = (frames - self.stats_previous[1]) / elapsed
+        self.stats_previous = (snap['time'], frames)
+
+        lines = [f"{'packets/sec':<32}{rate:>14,.0f}", ""]
+        lines.append(f"{'LATENCY':<24}{'count':>10}{'p50':>12}{'p99':>12}")
+        for name, hist in sorted(snap['histograms'].items()):
+            lines.append(f"{name:<24}{hist['count']:>10,}{format_seconds(hist['p50']):>12}{format_seconds(hist['p99']):>12}")
+        lines.append("")
+        for name, value in sorted(list(gauges.items()) + list(snap['counters'].items())):
+            shown = f"{value:,.3f}" if isinstance(value, float) else f"{value:,}"
+            lines.append(f"{name:<32}{shown:>14}")
+        self.stats_box.configure(state="normal")
+        self.stats_box.delete("1.0", "end")
+        self.stats_box.insert("end", "\n".join(lines))
+        self.stats_box.configure(state="disabled")
+        self.after(1000, self.refresh_stats_panel)
 
     def get_color_params(self, risk):
         if risk < 0.25: r, g, b = 16, 185, 129 # success
@@ -463,54 +611,15 @@ class NetworkInsecurityApp(ctk.CTk):
         text_color = "white"
         return fg_color, hover_color, text_color
 
-    def add_log(self, message, ip=None):
-        if not self.running: return
-        self.log_textbox.configure(state="normal")
-        timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        
-        # Determine base severity tag
-        tag = "info"
-        if "UNSECURED" in message or "CRITICAL" in message or "ERROR" in message: tag = "danger"
-        elif "DNS" in message or "RESOLVED" in message: tag = "warning"
-        elif "IDENTITY" in message or "BROADCAST" in message or "mDNS" in message: tag = "safe"
-        
-        tags = [tag]
-        if ip:
-            # Create a unique clickable tag for this specific log entry
-            click_tag = f"click_{timestamp}_{ip.replace('.', '_')}"
-            tags.append(click_tag)
-            
-            # Configure clickable appearance (Underline on hover)
-            self.log_textbox.tag_config(click_tag, foreground=self.log_textbox.tag_cget(tag, "foreground"))
-            
-            # Bind click event
-            self.log_textbox.tag_bind(click_tag, "<Button-1>", lambda e, addr=ip: self.select_device(addr))
-            
-            # Bind hover events to change cursor and underline
-            self.log_textbox.tag_bind(click_tag, "<Enter>", lambda e, t=click_tag: (
-                self.log_textbox.tag_config(t, underline=True),
-                self.log_textbox.configure(cursor="hand2")
-            ))
-            self.log_textbox.tag_bind(click_tag, "<Leave>", lambda e, t=click_tag: (
-                self.log_textbox.tag_config(t, underline=False),
-                self.log_textbox.configure(cursor="")
-            ))
-
-        self.log_textbox.insert("end", f"[{timestamp}] {message}\n", tuple(tags))
-        self.log_textbox.see("end")
-        self.log_textbox.configure(state="disabled")
-
-    def perform_auto_clear(self):
+    def add_log(self, message, ip=None, host_ip=None):
         if not self.running: return
-        self.log_textbox.configure(state="normal")
-        self.log_textbox.delete("1.0", "end")
-        self.log_textbox.configure(state="disabled")
-        self.add_log("SYSTEM: LOGS CLEARED (5 MIN CYCLE)")
-        self.after(300000, self.perform_auto_clear)
+        self.log_console.append(message, ip=ip, host_ip=host_ip)
 
     def update_global_risk(self):
         if not self.discovered_devices: return
-        max_risk = max(dev['risk'] for dev in self.discovered_devices.values())
+        max_risk = round(self.engine.max_risk(), 2)
+        if max_risk == self.shown_risk: return
+        self.shown_risk = max_risk
         self.risk_gauge.set(max_risk)
         
         if max_risk < 0.1:
@@ -527,11 +636,11 @@ class NetworkInsecurityApp(ctk.CTk):
         self.risk_label.configure(text=text, text_color=color)
         self.risk_gauge.configure(progress_color=color)
 
-    def update_devices(self, ip, activity, risk_weight=0.0, potential_name=None):
+    def update_devices(self, ip):
         if not self.running: return
-        if ip not in self.discovered_devices:
-            self.discovered_devices[ip] = {'activities': [], 'risk': 0.0, 'name': potential_name}
-            btn = ctk.CTkButton(self.inventory_frame, text=f"⊕ {potential_name if potential_name else 'RECON...'} \n  {ip}", 
+        dev = self.discovered_devices[ip]
+        if ip not in self.device_buttons:
+            btn = ctk.CTkButton(self.inventory_frame, text=f"⊕ {dev.name if dev.name else 'RECON...'} \n  {ip}", 
                                command=lambda i=ip: self.select_device(i), fg_color="transparent", 
                                hover_color=COLORS["border"], text_color=COLORS["text_primary"],
                                border_width=1, border_color=COLORS["border"],
@@ -539,25 +648,33 @@ class NetworkInsecurityApp(ctk.CTk):
                                corner_radius=UI_STYLE["btn_radius"])
             btn.pack(fill="x", padx=5, pady=5)
             self.device_buttons[ip] = btn
+            self.device_labels[ip] = dev.name
             
             # Auto-select the first device that appears
             if self.selected_device is None:
                 self.after(100, lambda: self.select_device(ip))
-        dev = self.discovered_devices[ip]
-        if potential_name and not dev['name']:
-            dev['name'] = potential_name
-            self.device_buttons[ip].configure(text=f"{potential_name}\n{ip}")
-        if activity not in dev['activities']:
-            dev['activities'].append(activity)
-            dev['risk'] = min(1.0, dev['risk'] + risk_weight)
-            fg, hvr, txt = self.get_color_params(dev['risk'])
+        if dev.name and not self.device_labels[ip]:
+            self.device_labels[ip] = dev.name
+            self.device_buttons[ip].configure(text=f"{dev.name}\n{ip}")
+        fg, hvr, txt = self.get_color_params(self.engine.device_risk(ip))
+        if fg != self.button_colors.get(ip):
+            self.button_colors[ip] = fg
             self.device_buttons[ip].configure(border_color=fg)
-            self.after(0, self.update_global_risk)
+        self.risk_dirty = True
+        if self.selected_device == ip: self.refresh_detail_view()
+
+    def refresh_risk_colors(self):
+        # Risk decays between events: recolour only the buttons whose band changed
+        for ip, btn in self.device_buttons.items():
+            fg = self.get_color_params(self.engine.device_risk(ip))[0]
+            if fg != self.button_colors.get(ip):
+                self.button_colors[ip] = fg
+                btn.configure(border_color=fg)
 
     def select_device(self, ip):
         self.selected_device = ip
-        dev_data = self.discovered_devices[ip]
-        self.detail_label.configure(text=f"DEVICE INTELLIGENCE: {dev_data['name'] if dev_data['name'] else ip}")
+        dev = self.discovered_devices[ip]
+        self.detail_label.configure(text=f"DEVICE INTELLIGENCE: {dev.name if dev.name else ip}")
         self.detail_frame.grid(row=1, column=0, sticky="nsew", pady=(10, 0))
         self.refresh_detail_view()
         self.update_sidebar_inventory(ip)
@@ -566,28 +683,38 @@ class NetworkInsecurityApp(ctk.CTk):
 
     def refresh_detail_view(self):
         if not self.selected_device: return
-        dev_data = self.discovered_devices[self.selected_device]
+        # Several updates for the selected device can land in one render tick; draw it once per change
+        version = (self.selected_device, self.discovered_devices[self.selected_device].version,
+                   round(self.engine.device_risk(self.selected_device) * 100))
+        if version == self.detail_rendered: return
+        self.detail_rendered = version
+        name, risk, activities, per_minute = self.engine.snapshot(self.selected_device, SETTINGS["detail_max_activities"])
         self.detail_textbox.configure(state="normal")
         self.detail_textbox.delete("1.0", "end")
         
-        risk_int = int(dev_data['risk'] * 100)
+        risk_int = round(risk * 100)
         risk_tag = "safe" if risk_int < 25 else "warning" if risk_int < 75 else "danger"
         
         self.detail_textbox.insert("end", "Device: ", "normal")
-        self.detail_textbox.insert("end", f"{dev_data['name']}\n", "body_bold")
+        self.detail_textbox.insert("end", f"{name}\n", "body_bold")
         self.detail_textbox.insert("end", "IP Address: ", "normal")
         self.detail_textbox.insert("end", f"{self.selected_device}\n", "mono")
         self.detail_textbox.insert("end", "Risk Factor: ", "normal")
         self.detail_textbox.insert("end", f"[{risk_int}%]\n", risk_tag)
+        if per_minute:
+            shown = ", ".join(f"{c} {r:g}" for c, r in sorted(per_minute.items(), key=lambda item: -item[1]))
+            self.detail_textbox.insert("end", "Events/min: ", "normal")
+            self.detail_textbox.insert("end", f"{sum(per_minute.values()):g} ({shown})\n", "mono")
         self.detail_textbox.insert("end", "─" * 40 + "\n\n", "normal")
         
         self.detail_textbox.insert("end", "DETECTION LOG:\n", "body_bold")
-        for act in reversed(dev_data['activities']):
+        for act, rec in activities:
             a_tag = "normal"
             if "Unsecured" in act or "CRITICAL" in act: a_tag = "danger"
             elif "Browsing" in act or "Domain" in act: a_tag = "warning"
             elif "Identity" in act or "Broadcasting" in act or "Initiated" in act: a_tag = "safe"
-            self.detail_textbox.insert("end", f" ➜ {act}\n", a_tag)
+            hits = f"  (x{rec.hits})" if rec.hits > 1 else ""
+            self.detail_textbox.insert("end", f" ➜ {act}{hits}\n", a_tag)
             
         self.detail_textbox.configure(state="disabled")
 
@@ -595,87 +722,16 @@ class NetworkInsecurityApp(ctk.CTk):
         self.map_widget.set_position(marker.position[0], marker.position[1])
         self.map_widget.set_zoom(10)
 
-    def packet_callback(self, pkt):
-        if not self.is_sniffing: return
-        if not pkt.haslayer('IP'): return
-        src, dst = pkt['IP'].src, pkt['IP'].dst
-
-        # --- OPTIMIZATION: Early Exit/Filtering ---
-        is_external_dst = not (dst.startswith(("10.", "192.168.", "172.16.", "127.")))
-        
-        # 1. DNS logic (Privacy Leak)
-        if pkt.haslayer('DNS') and pkt.getlayer('DNS').qr == 0:
-            try:
-                qname = pkt.getlayer('DNSQR').qname.decode('utf-8').strip('.')
-                activity = f"Browsing {qname}"
-                if self.should_process(src, activity):
-                    msg = f"RESOLVED: {src} -> {qname}"
-                    self.after(10, lambda m=msg, s=src, q=qname: (self.add_log(m, ip=s), self.update_devices(s, activity, risk_weight=0.01, potential_name=q.split('.')[-2].capitalize())))
-                
-                if is_external_dst:
-                    threading.Thread(target=self.geolocate_ip, args=(dst,), daemon=True).start()
-            except: pass
-
-        # 2. HTTP logic
-        elif pkt.haslayer('TCP') and pkt['TCP'].dport == 80:
-            try:
-                payload = bytes(pkt['TCP'].payload).decode('utf-8', errors='ignore')
-                if payload.startswith("GET"):
-                    first_line = payload.split('\r\n')[0] 
-                    name = self.get_hostname(dst)
-                    activity = f"Browsing Website: Unsecured ({name})"
-                    if self.should_process(src, activity):
-                        msg = f"UNSECURED ACTIVITY: {src} -> {first_line}"
-                        self.after(10, lambda m=msg, s=src, a=activity: (self.add_log(m, ip=s), self.update_devices(s, a, risk_weight=0.08)))
-                    
-                    if is_external_dst:
-                        threading.Thread(target=self.geolocate_ip, args=(dst,), daemon=True).start()
-                else:
-                    name = self.get_hostname(dst)
-                    activity = f"Unsecured Traffic: {name}"
-                    if self.should_process(src, activity):
-                        msg = f"UNSECURED DATA: {src} -> {name}"
-                        self.after(10, lambda m=msg, s=src, a=activity: (self.add_log(m, ip=s), self.update_devices(s, a, risk_weight=0.04)))
-                    
-                    if is_external_dst:
-                        threading.Thread(target=self.geolocate_ip, args=(dst,), daemon=True).start()
-            except: pass
-
-        # 3. Discovery logic
-        elif pkt.haslayer('UDP') and (pkt['UDP'].dport in [1900, 5353]):
-            protocol = "SSDP" if pkt['UDP'].dport == 1900 else "mDNS"
-            activity = f"{protocol} Identity Leak"
-            if self.should_process(src, activity, interval=10.0): # Long interval for broadcasts
-                name = None
-                try:
-                    raw_payload = bytes(pkt['UDP'].payload).decode('utf-8', errors='ignore')
-                    if "SERVER:" in raw_payload:
-                        server_info = raw_payload.split("SERVER:")[1].split("\r\n")[0].strip()
-                        name = f"Node: {server_info.split('/')[0]}" 
-                    elif "LOCATION:" in raw_payload: name = "UPnP Service"
-                    if protocol == "mDNS":
-                        if pkt.haslayer('DNSRR'):
-                            rrname = pkt.getlayer('DNSRR').rrname.decode('utf-8', errors='ignore').strip('.')
-                            if ".local" in rrname and not rrname.startswith('_'): name = rrname.replace(".local", "")
-                        elif pkt.haslayer('DNSQR'):
-                            qname = pkt.getlayer('DNSQR').qname.decode('utf-8', errors='ignore').strip('.')
-                            if ".local" in qname and not qname.startswith('_'): name = qname.replace(".local", "")
-                    if not name and protocol == "mDNS": name = "Apple/Linux Device"
-                except: pass
-                
-                msg = f"{protocol} IDENTITY SHOUT: {src}"
-                display_name = f"{name} ({protocol})" if name else f"Private {protocol} Device"
-                self.after(10, lambda m=msg, s=src, p=protocol, n=display_name, a=activity: (self.add_log(m, ip=s), self.update_devices(s, a, risk_weight=0.005, potential_name=n)))
-
-        # 4. General Traffic (Map Only)
-        elif (pkt.haslayer('TCP') or pkt.haslayer('UDP')) and is_external_dst:
-            threading.Thread(target=self.geolocate_ip, args=(dst,), daemon=True).start()
-
-    def start_sniffing(self):
-        try: sniff(opened_socket=conf.L3socket(), filter="udp port 53 or port 1900 or port 5353 or tcp port 80", prn=self.packet_callback, store=0, stop_filter=lambda x: not self.is_sniffing)
-        except Exception as e:
-            if self.running: self.after(0, lambda: self.add_log(f"ERROR: {str(e)}"))
-
 if __name__ == "__main__":
-    app = NetworkInsecurityApp()
+    parser = argparse.ArgumentParser(description="NETSCAN network visibility prototype")
+    parser.add_argument("--clean-start", action="store_true", help="ignore the saved session (it is replaced on the next snapshot)")
+    parser.add_argument("--session", metavar="PATH", help="session snapshot file (default: netscan_session.bin beside the app)")
+    parser.add_argument("--lookup-cache", metavar="PATH", help="geolocation/reverse-DNS cache (default: netscan_cache.db beside the app)")
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS) # bench.py startup
+    args = parser.parse_args()
+    if args.clean_start: SETTINGS["session"]["resume"] = False
+    if args.session: SETTINGS["session"]["path"] = args.session
+    if args.lookup_cache: SETTINGS["lookup_cache_db"] = args.lookup_cache
+    app = NetworkInsecurityApp(startup_probe=args.startup_probe)
     app.mainloop()
+    if args.startup_probe and app.sensor_failed: sys.exit(1)
@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+from scapy.all import Ether, Dot1Q, IP, IPv6, UDP, TCP, DNS, DNSQR, DNSRR, DNSRRSRV, ARP, Raw
+
+from fastpath import parse_frame, frame_from_scapy, classify, Unusual
+from engine import AnalysisEngine
+
+
+def sample_frames():
+    # One of each traffic shape packet_callback distinguishes, as raw Ethernet frames
+    eth = Ether(src="aa:bb:cc:dd:ee:01", dst="aa:bb:cc:dd:ee:02")
+    pkts = [
+        eth / IP(src="192.168.1.10", dst="8.8.8.8") / UDP(sport=50000, dport=53) / DNS(rd=1, qd=DNSQR(qname="www.example.co.uk")),
+        eth / IP(src="192.168.1.11", dst="192.168.1.1") / UDP(sport=50001, dport=53) / DNS(rd=1, qd=DNSQR(qname="telemetry.vendor.com")),
+        eth / IP(src="8.8.8.8", dst="192.168.1.10") / UDP(sport=53, dport=50000) / DNS(qr=1, qd=DNSQR(qname="www.example.co.uk"), an=DNSRR(rrname="www.example.co.uk", rdata="93.184.216.34")),
+        eth / IP(src="192.168.1.12", dst="93.184.216.34") / TCP(sport=40000, dport=80, flags="PA") / Raw(b"GET /index.html HTTP/1.1\r\nHost: example.com\r\n\r\n"),
+        eth / IP(src="192.168.1.12", dst="93.184.216.34") / TCP(sport=40000, dport=80, flags="PA") / Raw(b"POST /api HTTP/1.1\r\nHost: example.com\r\n\r\n{}"),
+        eth / IP(src="192.168.1.20", dst="239.255.255.250") / UDP(sport=1900, dport=1900) / Raw(b"NOTIFY * HTTP/1.1\r\nLOCATION: http://192.168.1.20:80/desc.xml\r\nSERVER: Linux/3.14 UPnP/1.0 Roku/9.4\r\n\r\n"),
+        eth / IP(src="192.168.1.21", dst="224.0.0.251") / UDP(sport=5353, dport=5353) / DNS(qr=1, aa=1, qd=[], an=[DNSRRSRV(rrname="Living-Room._airplay._tcp.local", target="Living-Room.local"), DNSRR(rrname="Living-Room.local", rdata="192.168.1.21")]),
+        eth / IP(src="192.168.1.22", dst="224.0.0.251") / UDP(sport=5353, dport=5353) / DNS(qd=DNSQR(qname="_googlecast._tcp.local", qtype="PTR")),
+        eth / IP(src="192.168.1.10", dst="142.250.80.46") / TCP(sport=40001, dport=443, flags="A"),
+        eth / IP(src="192.168.1.10", dst="142.250.80.46") / UDP(sport=40002, dport=443) / Raw(b"\x00" * 64),
+        eth / Dot1Q(vlan=10) / IP(src="192.168.1.30", dst="1.1.1.1") / UDP(sport=50003, dport=53) / DNS(rd=1, qd=DNSQR(qname="vlan.example.net")),
+        eth / IPv6(src="fe80::1", dst="ff02::fb") / UDP(sport=5353, dport=5353) / DNS(qd=DNSQR(qname="v6.local")),
+        Ether() / ARP(psrc="192.168.1.1", pdst="192.168.1.10"),
+    ]
+    return [(bytes(p), Ether) for p in pkts]
+
+
+def frame_key(frame):
+    if frame is None: return None
+    # rrname is only parsed (and only used) for mDNS
+    mdns = 5353 in (frame.sport, frame.dport)
+    dns = frame.dns and (frame.dns.qr, frame.dns.qname, frame.dns.rrname if mdns else None)
+    return (frame.src, frame.dst, frame.proto, frame.sport, frame.dport, frame.payload if not dns else None, dns)
+
+
+def check_equivalence(frames):
+    mismatches = 0
+    for data, kind in frames:
+        try: fast = parse_frame(data, kind)
+        except Unusual: continue # handled by the Scapy fallback, identical by construction
+        slow = frame_from_scapy(kind(data))
+        if frame_key(fast) != frame_key(slow):
+            mismatches += 1
+            print(f"  MISMATCH {kind(data).summary()}\n    fast={frame_key(fast)}\n    slow={frame_key(slow)}")
+    return mismatches
+
+
+def measure(label, fn, frames, count):
+    start = time.perf_counter()
+    n = 0
+    while n < count:
+        for data, kind in frames:
+            fn(data, kind)
+        n += len(frames)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {n / elapsed:>12,.0f} pkts/sec")
+    return n / elapsed
+
+
+def bench_fastpath(count):
+    frames = sample_frames()
+    print("FASTPATH vs SCAPY DISSECTION")
+    print(f"  equivalence mismatches: {check_equivalence(frames)}")
+    slow = measure("scapy dissection", lambda d, k: frame_from_scapy(k(d)), frames, count // 10)
+    fast = measure("fast path (classify)", classify, frames, count)
+    print(f"  speedup: {fast / slow:.1f}x")
+
+
+# --- SYNTHETIC TRAFFIC ---
+# Raw Ethernet/IPv4 frames built with struct, so generating a large mix is fast
+# and the same seed always yields the same bytes.
+ETH_HEADER = bytes.fromhex("aabbccddee02aabbccddee010800")
+DEFAULT_MIX = {"dns": 30, "http_get": 8, "http_other": 4, "ssdp": 4, "mdns": 4, "flow": 50}
+
+
+def ipv4(src, dst, proto, payload, ident=0):
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), ident & 0xFFFF, 0, 64, proto, 0,
+                         socket.inet_aton(src), socket.inet_aton(dst))
+    return ETH_HEADER + header + payload
+
+
+def udp(src, dst, sport, dport, payload):
+    return ipv4(src, dst, 17, struct.pack("!HHHH", sport, dport, 8 + len(payload), 0) + payload)
+
+
+def tcp(src, dst, sport, dport, payload=b"", seq=0):
+    return ipv4(src, dst, 6, struct.pack("!HHIIBBHHH", sport, dport, seq, 0, 5 << 4, 0x18, 65535, 0, 0) + payload)
+
+
+def dns_name(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".")) + b"\x00"
+
+
+def dns_query(qid, name):
+    return struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0) + dns_name(name) + struct.pack("!HH", 1, 1)
+
+
+def mdns_response(host, addr):
+    answer = dns_name(f"{host}.local") + struct.pack("!HHIH", 1, 0x8001, 120, 4) + socket.inet_aton(addr)
+    return struct.pack("!HHHHHH", 0, 0x8400, 0, 1, 0, 0) + answer
+
+
+class TrafficGenerator:
+    # Reproducible packet mix over `devices` LAN hosts, `domains` DNS names and
+    # `destinations` external servers. mix maps a traffic kind to its weight.
+    def __init__(self, devices=50, domains=1000, destinations=500, mix=None, seed=1):
+        self.rng = random.Random(seed)
+        self.devices = [f"192.168.{1 + i // 250}.{1 + i % 250}" for i in range(devices)]
+        self.domains = [f"host{i}.site{i % 97}.example.com" for i in range(domains)]
+        self.destinations = [f"{23 + i // 65025}.{1 + (i // 255) % 255}.{1 + i % 255}.10" for i in range(destinations)]
+        self.mix = mix or DEFAULT_MIX
+        self.kinds = list(self.mix)
+        self.weights = [self.mix[k] for k in self.kinds]
+
+    def frame(self, i):
+        rng = self.rng
+        kind = rng.choices(self.kinds, self.weights)[0]
+        src = rng.choice(self.devices)
+        if kind == "dns":
+            return udp(src, "192.168.1.1", 30000 + i % 30000, 53, dns_query(i & 0xFFFF, rng.choice(self.domains)))
+        dst = rng.choice(self.destinations)
+        if kind == "http_get":
+            path = f"/item/{rng.randrange(10000)}"
+            return tcp(src, dst, 40000 + i % 20000, 80, f"GET {path} HTTP/1.1\r\nHost: {dst}\r\n\r\n".encode())
+        if kind == "http_other":
+            return tcp(src, dst, 40000 + i % 20000, 80, b"\x17\x03\x03" + bytes(rng.randrange(40, 400)))
+        if kind == "ssdp":
+            vendor = rng.choice(("Linux/4.9 UPnP/1.0 Roku/11", "Windows/10 UPnP/1.1 Xbox", "FreeRTOS UPnP/1.0 Sonos"))
+            notify = f"NOTIFY * HTTP/1.1\r\nLOCATION: http://{src}:80/desc.xml\r\nSERVER: {vendor}\r\n\r\n"
+            return udp(src, "239.255.255.250", 1900, 1900, notify.encode())
+        if kind == "mdns":
+            return udp(src, "224.0.0.251", 5353, 5353, mdns_response(f"Device-{src.rsplit('.', 1)[1]}", src))
+        # Background flow: TCP/UDP to an external server on a non-detector port
+        if rng.random() < 0.7: return tcp(src, dst, 50000 + i % 10000, 443, bytes(rng.randrange(0, 1200)), seq=i)
+        return udp(src, dst, 50000 + i % 10000, 443, bytes(rng.randrange(20, 1200)))
+
+    def frames(self, count):
+        return [self.frame(i) for i in range(count)]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_engine(frames, rate, timed=False):
+    # Headless engine, packet timestamps spaced at `rate` pkts/sec so dedup and
+    # flow expiry behave the same on every run regardless of machine speed
+    engine = AnalysisEngine(packet_time=True)
+    process = engine.process_raw
+    step = 1.0 / rate
+    latencies = []
+    start = time.perf_counter()
+    if timed:
+        clock = time.perf_counter
+        for i, data in enumerate(frames):
+            t0 = clock()
+            process(data, i * step, Ether)
+            latencies.append(clock() - t0)
+    else:
+        for i, data in enumerate(frames):
+            process(data, i * step, Ether)
+    elapsed = time.perf_counter() - start
+    engine.expire_flows(everything=True)
+    return engine, elapsed, latencies
+
+
+def bench_traffic(count, devices, domains, destinations, rate, seed):
+    gen = TrafficGenerator(devices, domains, destinations, seed=seed)
+    frames = gen.frames(count)
+
+    engine, elapsed, _ = run_engine(frames, rate)
+    _, _, latencies = run_engine(frames, rate, timed=True)
+    latencies.sort()
+    tracemalloc.start()
+    run_engine(frames, rate)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stats = engine.stats()
+    result = {'packets': count, 'devices': devices, 'domains': domains, 'destinations': destinations, 'seed': seed,
+              'pps': count / elapsed, 'p50_us': percentile(latencies, 0.5) * 1e6,
+              'p99_us': percentile(latencies, 0.99) * 1e6, 'p999_us': percentile(latencies, 0.999) * 1e6,
+              'max_us': latencies[-1] * 1e6 if latencies else 0.0, 'peak_mem_mb': peak / 2 ** 20,
+              'engine': stats}
+    print("SYNTHETIC TRAFFIC THROUGH THE ANALYSIS ENGINE")
+    print(f"  mix: {count:,} packets, {devices} devices, {domains} domains, {destinations} destinations (seed {seed})")
+    print(f"  throughput                   {result['pps']:>12,.0f} pkts/sec")
+    print(f"  latency p50 / p99 / p99.9    {result['p50_us']:>8.1f} / {result['p99_us']:.1f} / {result['p999_us']:.1f} us")
+    print(f"  peak traced memory           {result['peak_mem_mb']:>12.1f} MB")
+    print(f"  engine state: {stats['devices']} devices, {stats['activities']} activities, "
+          f"{stats['dedup_entries']} dedup entries")
+    return result
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def state_args(directory):
+    # A fresh session and lookup cache per launch: the user's own files are never read or rewritten
+    return ["--session", os.path.join(directory, "session.bin"), "--lookup-cache", os.path.join(directory, "cache.db")]
+
+
+def start_daemon(directory):
+    # Seconds from launch until the API answers, then until /status reports capture_ready
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "daemon.py"), "--listen", "127.0.0.1:0", "--paused",
+                             *state_args(directory)],
+                            cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        line = proc.stdout.readline()
+        listening = time.perf_counter() - start
+        if not line.startswith("NETSCAN daemon listening on "): raise RuntimeError("daemon did not start")
+        url = line.split()[4]
+        while True:
+            with urllib.request.urlopen(f"{url}/status", timeout=5) as resp:
+                if json.loads(resp.read())['capture_ready']: break
+            time.sleep(0.01)
+        return {'api_up': listening, 'capture_ready': time.perf_counter() - start}
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def start_window(directory):
+    # app.py --startup-probe prints each milestone as it is reached, then closes itself
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "app.py"), "--startup-probe", *state_args(directory)],
+                            cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    times = {}
+    for line in proc.stdout:
+        milestone = line.strip()
+        if milestone == "paint": times['first_paint'] = time.perf_counter() - start
+        elif milestone == "capture_ready": times['capture_ready'] = time.perf_counter() - start
+    if proc.wait(10) or len(times) < 2: raise RuntimeError("window did not start")
+    return times
+
+
+def bench_startup(runs):
+    # Process launches with empty state; the median of each milestone is reported (the first run also warms the OS file cache)
+    targets = [("daemon", "API up", 'api_up', start_daemon)]
+    if sys.platform in ("win32", "darwin") or os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        targets.append(("window", "first paint", 'first_paint', start_window))
+    result = {'runs': runs}
+    print("STARTUP (seconds from process launch, median)")
+    for name, first_label, first_key, launch in targets:
+        samples = []
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as directory: samples.append(launch(directory))
+        result[name] = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+        print(f"  {name:<8} {first_label:<12} {result[name][first_key]:>6.2f}    capture ready {result[name]['capture_ready']:>6.2f}")
+    if len(targets) == 1: print("  window   skipped (no display)")
+    return result
+
+
+def compare(result, baseline_path, tolerance):
+    # Fails (returns False) when throughput dropped or p99 latency grew beyond the tolerance
+    with open(baseline_path, encoding="utf-8") as f: baseline = json.load(f)
+    ok = True
+    if result['pps'] < baseline['pps'] * (1 - tolerance):
+        print(f"  REGRESSION: {result['pps']:,.0f} pkts/sec vs baseline {baseline['pps']:,.0f}")
+        ok = False
+    if result['p99_us'] > baseline['p99_us'] * (1 + tolerance):
+        print(f"  REGRESSION: p99 {result['p99_us']:.1f} us vs baseline {baseline['p99_us']:.1f} us")
+        ok = False
+    if ok: print(f"  within {tolerance:.0%} of baseline {baseline_path}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NETSCAN hot-path benchmarks")
+    parser.add_argument("suite", choices=["fastpath", "traffic", "startup"], nargs="?", default="fastpath")
+    parser.add_argument("--count", type=int, default=200000, help="packets per measurement")
+    parser.add_argument("--devices", type=int, default=50, help="traffic: LAN devices")
+    parser.add_argument("--domains", type=int, default=1000, help="traffic: distinct DNS names")
+    parser.add_argument("--destinations", type=int, default=500, help="traffic: external servers")
+    parser.add_argument("--rate", type=float, default=5000, help="traffic: simulated capture rate (packet timestamps)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5, help="startup: launches per measurement")
+    parser.add_argument("--save", metavar="PATH", help="traffic, startup: write the result as JSON (e.g. a baseline)")
+    parser.add_argument("--compare", metavar="PATH", help="traffic: exit 1 if slower than this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="traffic: allowed regression vs baseline")
+    args = parser.parse_args()
+    if args.suite == "fastpath": bench_fastpath(args.count)
+    elif args.suite == "startup":
+        result = bench_startup(args.runs)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f: json.dump(result, f, indent=2)
+    elif args.suite == "traffic":
+        result = bench_traffic(args.count, args.devices, args.domains, args.destinations, args.rate, args.seed)
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f: json.dump(result, f, indent=2)
+        if args.compare and not compare(result, args.compare, args.tolerance): sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import threading
+import time
+from array import array
+
+
+class PacketRing:
+    # Bounded ring of preallocated frame slots between the capture thread and
+    # the analysis workers. The single producer only moves head and consumers
+    # only move tail, so push() takes no lock; a full ring drops the new frame.
+    def __init__(self, capacity=4096, snaplen=2048):
+        self.capacity = capacity
+        self.snaplen = snaplen
+        self.slots = [bytearray(snaplen) for _ in range(capacity)]
+        self.lengths = array('I', [0]) * capacity
+        self.stamps = array('d', [0.0]) * capacity
+        self.kinds = [None] * capacity     # link-layer class of each frame
+        self.head = 0                      # total frames written (producer)
+        self.tail = 0                      # total frames read (consumers)
+        self.read_lock = threading.Lock()  # only contended between consumers
+        self.producer_lock = threading.Lock() # held by the one capture loop allowed to push
+        self.ready = threading.Event()
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def push(self, data, ts, kind):
+        depth = self.head - self.tail
+        if depth >= self.capacity:
+            self.dropped += 1
+            return False
+        i = self.head % self.capacity
+        n = min(len(data), self.snaplen)
+        self.slots[i][:n] = data[:n]
+        self.lengths[i] = n
+        self.stamps[i] = ts
+        self.kinds[i] = kind
+        self.head += 1 # publish only once the slot is filled
+        self.captured += 1
+        if depth + 1 > self.high_water: self.high_water = depth + 1
+        if not self.ready.is_set(): self.ready.set()
+        return True
+
+    def pop_batch(self, max_batch=256, timeout=0.1):
+        # Returns [(frame_bytes, ts, kind), ...]; empty after timeout
+        if self.head == self.tail:
+            self.ready.clear()
+            if self.head == self.tail and not self.ready.wait(timeout): return []
+        with self.read_lock:
+            batch = []
+            end = min(self.head, self.tail + max_batch)
+            for n in range(self.tail, end):
+                i = n % self.capacity
+                batch.append((bytes(self.slots[i][:self.lengths[i]]), self.stamps[i], self.kinds[i]))
+            self.tail = end
+        return batch
+
+    def mark_processed(self, count):
+        with self.read_lock: self.processed += count
+
+    def stats(self):
+        return {'captured': self.captured, 'dropped': self.dropped, 'processed': self.processed,
+                'depth': len(self), 'high_water': self.high_water, 'capacity': self.capacity}
+
+
+def capture_frames(sock, ring, keep_running, poll=0.2):
+    # Capture stage: raw frames and timestamps only, no dissection on this thread
+    with ring.producer_lock:
+        while keep_running():
+            if not sock.select([sock], poll): continue
+            try:
+                kind, data, ts = sock.recv_raw(ring.snaplen)
+            except (OSError, ValueError):
+                if not keep_running(): break
+                raise
+            if data: ring.push(data, ts or time.time(), kind)
+
+
+def analyze_frames(ring, handle, keep_running, max_batch=256):
+    # Analysis stage: drain the ring in batches and hand each frame to handle()
+    while keep_running():
+        batch = ring.pop_batch(max_batch)
+        for data, ts, kind in batch:
+            try: handle(data, ts, kind)
+            except Exception: pass
+        if batch: ring.mark_processed(len(batch))
+
+
+def open_capture_socket(conf, bpf, warn, **kwargs):
+    # Returns (socket, filtered). Scapy compiles BPF with libpcap (tcpdump on Linux);
+    # without it the socket captures everything and the engine's own protocol and
+    # destination checks discard what no detector reads
+    try: return conf.L3socket(filter=bpf, **kwargs), True
+    except Exception as e:
+        if not bpf: raise
+        warn(f"WARNING: capture filter unavailable ({e}); capturing unfiltered, install libpcap/tcpdump to filter in the kernel")
+        return conf.L3socket(**kwargs), False
+
+
+def shard_filter(base, shard, shards):
+    # Kernel-side split of one interface across processes: hash on the IPv4 source
+    # so every packet from a device lands in the same shard (and the same dedup state)
+    if shards <= 1: return base
+    return f"({base}) and ip[12:4] % {shards} = {shard}"
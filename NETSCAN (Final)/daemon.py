@@ -0,0 +1,43 @@
+import argparse
+import signal
+import threading
+
+from settings import SETTINGS
+from sensor import Sensor
+from api import ChangeFeed, ApiServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run NETSCAN capture and analysis as a headless service with a local query API")
+    parser.add_argument("--listen", default=SETTINGS["api"]["listen"], help='"host:port" or "unix:/path/to/socket"')
+    parser.add_argument("--interface", action="append", help="capture interface (repeat for several; default: the system default)")
+    parser.add_argument("--shards", type=int, help="capture processes per interface")
+    parser.add_argument("--paused", action="store_true", help="start without capturing (POST /capture/start to begin)")
+    parser.add_argument("--clean-start", action="store_true", help="ignore the saved session (it is replaced on the next snapshot)")
+    parser.add_argument("--session", metavar="PATH", help="session snapshot file (default: netscan_session.bin beside the app)")
+    parser.add_argument("--lookup-cache", metavar="PATH", help="geolocation/reverse-DNS cache (default: netscan_cache.db beside the app)")
+    args = parser.parse_args()
+
+    settings = dict(SETTINGS)
+    if args.interface: settings["capture_interfaces"] = args.interface
+    if args.shards: settings["capture_shards"] = args.shards
+    if args.clean_start: settings["session"] = dict(settings["session"], resume=False)
+    if args.session: settings["session"] = dict(settings["session"], path=args.session)
+    if args.lookup_cache: settings["lookup_cache_db"] = args.lookup_cache
+
+    feed = ChangeFeed(max_events=settings["api"]["max_events"], max_locations=settings["geo_cache"]["max_entries"])
+    sensor = Sensor(settings, listener=feed)
+    api = ApiServer(sensor, feed, args.listen, settings["api"]["page_size"]).start()
+    if not args.paused: sensor.start_capture()
+    print(f"NETSCAN daemon listening on {api.address()} ({'paused' if args.paused else 'capturing'})", flush=True)
+
+    done = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: done.set())
+    signal.signal(signal.SIGTERM, lambda *_: done.set())
+    while not done.wait(1.0): pass
+    api.stop()
+    sensor.close()
+
+
+if __name__ == "__main__":
+    main()
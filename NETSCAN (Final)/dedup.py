@@ -0,0 +1,58 @@
+import time
+
+
+class ExpiringDedup:
+    # Rate-limits repeated (ip, activity) keys. Timestamps live in two
+    # generations (current, previous) that rotate every `horizon` seconds, so a
+    # key older than the longest interval in use is dropped wholesale instead
+    # of being kept forever; memory is bounded by the keys seen in the last two
+    # horizons. Times come from time.monotonic() unless the caller passes its own
+    # (e.g. packet timestamps during a replay).
+    def __init__(self, horizon=10.0, clock=time.monotonic):
+        self.horizon = horizon # grows to the longest interval ever asked for
+        self.clock = clock
+        self.current = {}
+        self.previous = {}
+        self.rotated_at = None
+        self.passed = 0
+        self.suppressed = 0
+        self.expired = 0
+
+    def _rotate(self, now):
+        if self.rotated_at is None:
+            self.rotated_at = now
+            return
+        age = now - self.rotated_at
+        if age < self.horizon: return
+        self.expired += len(self.previous)
+        if age >= 2 * self.horizon: # Idle long enough that both generations are stale
+            self.expired += len(self.current)
+            self.previous = {}
+        else:
+            self.previous = self.current
+        self.current = {}
+        self.rotated_at = now
+
+    def check(self, key, interval, now=None):
+        # True if key was not seen within the last `interval` seconds (and records it)
+        now = self.clock() if now is None else now
+        if interval > self.horizon: self.horizon = interval
+        self._rotate(now)
+        last = self.current.get(key)
+        if last is None: last = self.previous.get(key)
+        if last is not None and now - last < interval:
+            self.suppressed += 1
+            return False
+        self.current[key] = now
+        self.passed += 1
+        return True
+
+    def clear(self):
+        self.current, self.previous, self.rotated_at = {}, {}, None
+
+    def __len__(self):
+        return len(self.current) + len(self.previous)
+
+    def stats(self):
+        return {'entries': len(self), 'horizon': self.horizon, 'passed': self.passed,
+                'suppressed': self.suppressed, 'expired': self.expired}
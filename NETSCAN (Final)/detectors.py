@@ -0,0 +1,38 @@
+from geolocation import PRIVATE_PREFIXES
+
+# Every analysis branch of AnalysisEngine.packet_callback declares the traffic it
+# needs (a BPF expression) and how many bytes of each frame it reads. Capture
+# compiles only the enabled ones, so the kernel drops everything else.
+def _external_dst():
+    # BPF twin of geolocation.is_private_ip() for the destination address
+    nets = []
+    for prefix in PRIVATE_PREFIXES:
+        octets = prefix.rstrip('.').split('.')
+        nets.append(f"{'.'.join(octets + ['0'] * (4 - len(octets)))}/{8 * len(octets)}")
+    return " and ".join(f"not dst net {net}" for net in nets)
+
+
+DETECTORS = {
+    "dns":       {"filter": "udp dst port 53", "snaplen": 512},                           # 1. DNS queries (privacy leak)
+    "http":      {"filter": "tcp dst port 80", "snaplen": 2048},                          # 2. Cleartext HTTP
+    "discovery": {"filter": "udp dst port 1900 or udp dst port 5353", "snaplen": 2048},   # 3. SSDP / mDNS identity shouts
+    "map":       {"filter": f"(tcp or udp) and {_external_dst()}", "snaplen": 96},       # 4. General traffic (headers only)
+}
+
+
+def enabled_detectors(names=None):
+    if names is None: return list(DETECTORS)
+    unknown = [n for n in names if n not in DETECTORS]
+    if unknown: raise ValueError(f"unknown detector(s): {', '.join(unknown)}")
+    return list(names)
+
+
+def build_filter(names=None):
+    # Minimal combined BPF for the enabled detectors (libpcap's optimizer merges the shared tests)
+    return " or ".join(f"({DETECTORS[n]['filter']})" for n in enabled_detectors(names))
+
+
+def capture_snaplen(names=None, limit=None):
+    # Bytes per frame the enabled detectors actually read, capped at limit
+    snaplen = max(DETECTORS[n]['snaplen'] for n in enabled_detectors(names))
+    return min(snaplen, limit) if limit else snaplen
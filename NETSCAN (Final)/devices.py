@@ -0,0 +1,68 @@
+import collections
+import sys
+
+
+class ActivityRecord:
+    __slots__ = ('first_seen', 'last_seen', 'hits', 'scored')
+
+    def __init__(self, now):
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.scored = now # when its risk weight was last added
+
+
+class Device:
+    # One discovered host. Activities are interned strings kept in insertion
+    # order with O(1) membership; past max_activities the oldest is dropped so
+    # a device that browses thousands of domains stays a fixed size.
+    __slots__ = ('ip', 'name', 'activities', 'max_activities', 'dropped', 'version', 'rates')
+
+    def __init__(self, ip, name=None, max_activities=500):
+        self.ip = ip
+        self.name = name
+        self.activities = collections.OrderedDict() # activity -> ActivityRecord
+        self.max_activities = max_activities
+        self.dropped = 0
+        self.version = 0 # bumped on every change, lets views skip redundant redraws
+        self.rates = {}  # category -> risk.SlidingWindow of reported events
+
+    def record(self, activity, now):
+        # Returns the activity's record (hits == 1 the first time it is seen while retained)
+        rec = self.activities.get(activity)
+        self.version += 1
+        if rec is not None:
+            rec.last_seen = now
+            rec.hits += 1
+            return rec
+        rec = self.activities[sys.intern(activity)] = ActivityRecord(now)
+        if len(self.activities) > self.max_activities:
+            self.activities.popitem(last=False)
+            self.dropped += 1
+        return rec
+
+    def rename_activity(self, old, new):
+        # Reverse DNS turned a raw IP into a name: replace in place, merging if the new one exists
+        rec = self.activities.get(old)
+        if rec is None: return
+        self.version += 1
+        if new in self.activities:
+            merged = self.activities.pop(old)
+            target = self.activities[new]
+            target.first_seen = min(target.first_seen, merged.first_seen)
+            target.last_seen = max(target.last_seen, merged.last_seen)
+            target.hits += merged.hits
+            return
+        items = [(sys.intern(new), r) if a == old else (a, r) for a, r in self.activities.items()]
+        self.activities = collections.OrderedDict(items)
+
+    def recent(self, limit=None):
+        # Newest first: [(activity, ActivityRecord), ...]
+        items = list(self.activities.items())
+        items.reverse()
+        return items[:limit] if limit else items
+
+    def to_dict(self):
+        return {'name': self.name, 'dropped_activities': self.dropped,
+                'activities': [{'activity': a, 'first_seen': r.first_seen, 'last_seen': r.last_seen, 'hits': r.hits}
+                               for a, r in self.activities.items()]}
@@ -0,0 +1,126 @@
+import functools
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PSL = os.path.join(HERE, "public_suffix_list.dat")  # https://publicsuffix.org/list/public_suffix_list.dat
+DEFAULT_CATEGORY_DIR = os.path.join(HERE, "domain_lists")    # tracker.txt, ad.txt, telemetry.txt, vendor.txt, ...
+
+# Used when no public_suffix_list.dat is present: every TLD plus the common
+# multi-label registries, enough to name devices sensibly offline.
+FALLBACK_SUFFIXES = (
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "ltd.uk", "plc.uk", "net.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au", "co.nz", "org.nz", "govt.nz",
+    "co.jp", "ne.jp", "or.jp", "ac.jp", "go.jp", "co.kr", "or.kr", "com.cn", "net.cn", "org.cn",
+    "com.br", "net.br", "org.br", "com.mx", "com.ar", "com.tr", "com.tw", "com.hk", "com.sg",
+    "co.in", "net.in", "org.in", "co.za", "co.il", "com.ua", "com.pl", "co.id",
+    "github.io", "cloudfront.net", "amazonaws.com", "azurewebsites.net", "herokuapp.com",
+)
+DEFAULT_WEIGHTS = {None: 0.01, "tracker": 0.03, "ad": 0.02, "telemetry": 0.03, "vendor": 0.005}
+
+RULE, WILDCARD_PARENT, EXCEPTION = 1, 2, 3
+FLAG = "" # labels are never empty, so "" holds a node's own data
+
+
+class DomainInfo:
+    __slots__ = ('registrable', 'name', 'category', 'risk')
+
+    def __init__(self, registrable, name, category, risk):
+        self.registrable = registrable # e.g. "example.co.uk" (None for bare suffixes / single labels)
+        self.name = name               # display label, e.g. "Example"
+        self.category = category       # tracker / ad / telemetry / vendor / None
+        self.risk = risk
+
+
+def _insert(root, labels, value):
+    node = root
+    for label in reversed(labels):
+        node = node.setdefault(label, {})
+    node[FLAG] = value
+
+
+class DomainIndex:
+    # Public-suffix rules and category lists in reversed-label tries (nested
+    # dicts keyed by label, TLD first), so classifying a name is one walk over
+    # its labels. Results are memoized in an LRU.
+    def __init__(self, suffix_rules=None, categories=None, weights=None, cache_size=65536):
+        self.suffixes = {}
+        self.categories = {}
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.rules = 0
+        self.listed = 0
+        for rule in (suffix_rules if suffix_rules is not None else FALLBACK_SUFFIXES): self.add_suffix(rule)
+        for category, domains in (categories or {}).items():
+            for domain in domains: self.add_category(domain, category)
+        self.classify = functools.lru_cache(maxsize=cache_size)(self._classify)
+
+    @classmethod
+    def load(cls, public_suffix_list=DEFAULT_PSL, category_dir=DEFAULT_CATEGORY_DIR, weights=None, cache_size=65536):
+        # public_suffix_list: publicsuffix.org .dat file; category_dir: <category>.txt files holding one
+        # domain per line (hosts-file lines such as "0.0.0.0 ads.example.com" also work). Missing files are skipped.
+        rules = None
+        if public_suffix_list and os.path.exists(public_suffix_list):
+            with open(public_suffix_list, encoding="utf-8") as f:
+                rules = [line.split()[0] for line in f if line.strip() and not line.startswith("//")]
+        categories = {}
+        if category_dir and os.path.isdir(category_dir):
+            for filename in sorted(os.listdir(category_dir)):
+                if not filename.endswith(".txt"): continue
+                with open(os.path.join(category_dir, filename), encoding="utf-8") as f:
+                    categories[filename[:-4]] = [line.split()[-1] for line in f if line.strip() and not line.startswith("#")]
+        return cls(rules, categories, weights, cache_size)
+
+    def add_suffix(self, rule):
+        rule = rule.strip().lower()
+        if not rule: return
+        if rule.startswith("!"):
+            _insert(self.suffixes, rule[1:].split("."), EXCEPTION)
+        elif rule.startswith("*."):
+            _insert(self.suffixes, rule.split("."), RULE) # "*" child: any label at that position
+        else:
+            _insert(self.suffixes, rule.split("."), RULE)
+        self.rules += 1
+
+    def add_category(self, domain, category):
+        domain = domain.strip().lower().strip(".")
+        if not domain or domain in ("localhost", "0.0.0.0"): return
+        _insert(self.categories, domain.split("."), category)
+        self.listed += 1
+
+    def suffix_length(self, labels):
+        # Number of trailing labels forming the public suffix (publicsuffix.org algorithm; default rule "*")
+        node = self.suffixes
+        match = 1
+        for i, label in enumerate(reversed(labels)):
+            child = node.get(label)
+            if child is None: child = node.get("*")
+            if child is None: break
+            flag = child.get(FLAG)
+            if flag == EXCEPTION: return i # The exception's parent is the suffix
+            if flag == RULE: match = i + 1
+            node = child
+        return match
+
+    def category(self, labels):
+        # Most specific listed parent wins: a listing for tracker.example also covers a.b.tracker.example
+        node = self.categories
+        found = None
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None: break
+            found = node.get(FLAG, found)
+        return found
+
+    def _classify(self, qname):
+        labels = qname.lower().strip(".").split(".")
+        if len(labels) < 2 or not all(labels): return DomainInfo(None, None, None, self.weights[None])
+        size = self.suffix_length(labels)
+        registrable = ".".join(labels[-size - 1:]) if len(labels) > size else None
+        name = labels[-size - 1].capitalize() if registrable else None
+        category = self.category(labels)
+        return DomainInfo(registrable, name, category, self.weights.get(category, self.weights[None]))
+
+    def stats(self):
+        info = self.classify.cache_info()
+        lookups = info.hits + info.misses
+        return {'suffix_rules': self.rules, 'listed_domains': self.listed, 'cache_entries': info.currsize,
+                'hit_rate': info.hits / lookups if lookups else 0.0}
@@ -0,0 +1,333 @@
+import collections
+import sys
+import threading
+import time
+
+from dedup import ExpiringDedup
+from detectors import enabled_detectors
+from domains import DomainIndex
+from devices import ActivityRecord, Device
+from fastpath import classify
+from flows import FlowTable
+from geolocation import is_private_ip
+from risk import RiskIndex, SlidingWindow
+
+
+class AnalysisEngine:
+    # Headless packet analysis: detectors, per-(device, activity) dedup and the
+    # device inventory. It never touches a UI; every change is reported to
+    # listener(kind, *args) as one of
+    #   ("log", message, ip, host_ip)   a console line (host_ip: raw IP awaiting reverse DNS)
+    #   ("device", ip)                  device created, renamed or given a new activity
+    #   ("hostname", dst, name)         reverse DNS answer for a raw IP shown earlier
+    #   ("flows", records)              aggregated records of expired external flows (map detector)
+    # geolocator and resolver are optional; without a resolver hosts stay raw IPs.
+    # packet_time: rate-limit on capture timestamps (replays) instead of the monotonic clock.
+    # detectors: names from detectors.DETECTORS to run (None = all); capture filters on the same list.
+    # flows: FlowTable options (timeouts, sample_rate, max_flows).
+    # metrics: optional metrics.MetricsRegistry; per-branch latency is only timed when it is enabled.
+    # exporter: optional export.EventExporter receiving one structured record per reported activity and flow.
+    # domains: domains.DomainIndex naming devices and weighting DNS risk (default: files next to the app).
+    # risk: decay and rate options ({"half_life": s, "rate_window": s, "rate_buckets": n}). A device's
+    #   risk is a decayed score read lazily; an activity adds its weight when first seen and again once
+    #   per half_life while it recurs. Reported events are also counted per category in sliding windows.
+    def __init__(self, listener=None, geolocator=None, resolver=None, packet_time=False, max_activities=500,
+                 detectors=None, flows=None, metrics=None, exporter=None, domains=None, risk=None):
+        self.listener = listener or (lambda kind, *args: None)
+        self.geolocator = geolocator
+        self.resolver = resolver
+        self.enabled = True
+        self.packet_time = packet_time
+        self.last_ts = None # newest capture timestamp, the clock for risk reads when packet_time is set
+        self.detectors = frozenset(enabled_detectors(detectors))
+        self.devices = {}            # IP -> devices.Device
+        self.max_activities = max_activities
+        risk = dict({"half_life": 1800.0, "rate_window": 60.0, "rate_buckets": 12}, **(risk or {}))
+        self.risk = RiskIndex(risk["half_life"], clock=self.now) # per-device decayed scores + global maximum
+        self.rearm = risk["half_life"] or float("inf")
+        self.rate_window, self.rate_buckets = risk["rate_window"], risk["rate_buckets"]
+        self.category_rates = {} # category -> SlidingWindow over every device
+        self.exporter = exporter
+        self.domains = domains or DomainIndex.load()
+        # External destinations are geolocated once, when their first flow is created
+        self.flows = FlowTable(on_new=lambda flow: self.locate(flow.key[1]),
+                               on_export=self.export_flows, **(flows or {}))
+        self.recent = ExpiringDedup() # (ip, activity) -> last time it was reported
+        self.lock = threading.RLock() # analysis workers and reverse DNS callbacks both update devices
+        self.counters = {'frames': 0, 'dns': 0, 'http': 0, 'discovery': 0, 'general': 0, 'other': 0}
+        self.timers = None # branch -> Histogram when instrumented
+        if metrics is not None and metrics.enabled:
+            self.timers = {name: metrics.histogram(f"analysis_{name}") for name in ('classify', 'dns', 'http', 'discovery', 'general', 'other')}
+            metrics.collect("analysis", self.stats)
+
+    def emit(self, kind, *args):
+        try: self.listener(kind, *args)
+        except Exception: pass
+
+    def locate(self, dst):
+        if self.geolocator: self.geolocator.submit(dst)
+
+    def lookup_host(self, dst):
+        return self.resolver.lookup(dst) if self.resolver else None
+
+    def process_raw(self, data, ts, kind):
+        timers = self.timers
+        if timers is None:
+            self.packet_callback(classify(data, kind), ts)
+            return
+        start = time.perf_counter()
+        frame = classify(data, kind)
+        parsed = time.perf_counter()
+        branch = self.packet_callback(frame, ts)
+        timers['classify'].observe(parsed - start)
+        if branch: timers[branch].observe(time.perf_counter() - parsed)
+
+    def should_process(self, ip, activity, interval=2.0, now=None):
+        with self.lock:
+            return self.recent.check((ip, activity), interval, now)
+
+    def now(self):
+        return self.last_ts if self.packet_time and self.last_ts is not None else time.time()
+
+    def update_devices(self, ip, activity, risk_weight=0.0, potential_name=None, now=None, dst=None, protocol=None, category=None):
+        now = time.time() if now is None else now
+        category = (category or protocol or "other").lower()
+        with self.lock:
+            dev = self.devices.get(ip)
+            if dev is None:
+                dev = self.devices[ip] = Device(ip, potential_name, self.max_activities)
+                self.risk.set(ip, 0.0, now)
+            if potential_name and not dev.name:
+                dev.name = potential_name
+            rec = dev.record(activity, now)
+            delta = 0.0
+            if rec.hits == 1 or now - rec.scored >= self.rearm:
+                rec.scored = now
+                delta = self.risk.add(ip, risk_weight, now)
+            for rates in (dev.rates, self.category_rates):
+                window = rates.get(category)
+                if window is None: window = rates[category] = SlidingWindow(self.rate_window, self.rate_buckets)
+                window.add(now)
+            name = dev.name
+            risk = self.risk.risk(ip, now) if self.exporter else 0.0
+        if self.exporter:
+            self.exporter.write({'ts': now, 'type': 'activity', 'src': ip, 'dst': dst, 'protocol': protocol,
+                                 'category': category, 'activity': activity, 'risk_delta': round(delta, 4),
+                                 'risk': round(risk, 4), 'name': name, 'geo': self.location(dst)})
+        self.emit("device", ip)
+
+    def location(self, ip):
+        # Known (lat, lon, city) of an external IP, without triggering a lookup
+        if not ip or not self.geolocator: return None
+        return self.geolocator.locations.get(ip)
+
+    def export_flows(self, records):
+        if self.exporter:
+            for record in records:
+                self.exporter.write(dict(record, ts=record['last'], type='flow', geo=self.location(record['dst'])))
+        self.emit("flows", records)
+
+    def apply_hostname(self, dst, name, src, old_activity, new_activity):
+        # A reverse DNS answer arrived: rewrite the raw IP in the device activity and log lines
+        with self.lock:
+            dev = self.devices.get(src)
+            if dev: dev.rename_activity(old_activity, new_activity)
+        self.emit("device", src)
+        self.emit("hostname", dst, name)
+
+    def watch_hostname(self, dst, src, activity, template):
+        # Concurrent lookups for the same IP share one query; each watcher gets its own callback
+        on_name = lambda name: self.apply_hostname(dst, name, src, activity, template.format(name))
+        name = self.resolver.lookup(dst, callback=on_name)
+        if name: on_name(name) # Resolved between the first lookup and now
+
+    def packet_callback(self, pkt, ts=None):
+        # pkt is a fastpath.Frame (raw-bytes parse, or Scapy fallback for unusual frames).
+        # Returns the name of the branch that handled it.
+        if not self.enabled or pkt is None: return
+        self.counters['frames'] += 1
+        ts = time.time() if ts is None else ts
+        if self.packet_time: self.last_ts = ts
+        clock = ts if self.packet_time else None # None: rate-limit on the monotonic clock
+        src, dst = pkt.src, pkt.dst
+
+        # --- OPTIMIZATION: Early Exit/Filtering ---
+        is_external_dst = not is_private_ip(dst)
+        detectors = self.detectors
+        if is_external_dst and pkt.proto and "map" in detectors:
+            with self.lock: self.flows.observe((src, dst, pkt.proto, pkt.sport, pkt.dport), ts, pkt.length)
+
+        # 1. DNS logic (Privacy Leak)
+        if pkt.dns and pkt.dns.qr == 0 and "dns" in detectors:
+            branch = 'dns'
+            try:
+                qname = pkt.dns.qname.decode('utf-8').strip('.')
+                activity = f"Browsing {qname}"
+                if self.should_process(src, activity, now=clock):
+                    info = self.domains.classify(qname) # registrable domain, category and risk weight
+                    tag = f" [{info.category.upper()}]" if info.category else ""
+                    self.emit("log", f"RESOLVED: {src} -> {qname}{tag}", src, None)
+                    self.update_devices(src, activity, info.risk, info.name, now=ts, dst=dst, protocol="DNS", category=info.category)
+
+                if is_external_dst:
+                    self.locate(dst)
+            except: pass
+
+        # 2. HTTP logic
+        elif pkt.proto == "TCP" and pkt.dport == 80 and "http" in detectors:
+            branch = 'http'
+            try:
+                payload = pkt.payload.decode('utf-8', errors='ignore')
+                # Reverse DNS never blocks analysis: unresolved hosts show the raw IP until the name arrives
+                name = self.lookup_host(dst)
+                host = name or dst
+                if payload.startswith("GET"):
+                    first_line = payload.split('\r\n')[0]
+                    activity = f"Browsing Website: Unsecured ({host})"
+                    if self.should_process(src, activity, now=clock):
+                        self.emit("log", f"UNSECURED ACTIVITY: {src} -> {first_line}", src, None)
+                        self.update_devices(src, activity, 0.08, now=ts, dst=dst, protocol="HTTP")
+                        if not name and self.resolver: self.watch_hostname(dst, src, activity, "Browsing Website: Unsecured ({})")
+                else:
+                    activity = f"Unsecured Traffic: {host}"
+                    if self.should_process(src, activity, now=clock):
+                        self.emit("log", f"UNSECURED DATA: {src} -> {host}", src, None if name else dst)
+                        self.update_devices(src, activity, 0.04, now=ts, dst=dst, protocol="HTTP")
+                        if not name and self.resolver: self.watch_hostname(dst, src, activity, "Unsecured Traffic: {}")
+
+                if is_external_dst:
+                    self.locate(dst)
+            except: pass
+
+        # 3. Discovery logic
+        elif pkt.proto == "UDP" and (pkt.dport in [1900, 5353]) and "discovery" in detectors:
+            branch = 'discovery'
+            protocol = "SSDP" if pkt.dport == 1900 else "mDNS"
+            activity = f"{protocol} Identity Leak"
+            if self.should_process(src, activity, interval=10.0, now=clock): # Long interval for broadcasts
+                name = None
+                try:
+                    raw_payload = pkt.payload.decode('utf-8', errors='ignore')
+                    if "SERVER:" in raw_payload:
+                        server_info = raw_payload.split("SERVER:")[1].split("\r\n")[0].strip()
+                        name = f"Node: {server_info.split('/')[0]}"
+                    elif "LOCATION:" in raw_payload: name = "UPnP Service"
+                    if protocol == "mDNS":
+                        if pkt.dns and pkt.dns.rrname is not None:
+                            rrname = pkt.dns.rrname.decode('utf-8', errors='ignore').strip('.')
+                            if ".local" in rrname and not rrname.startswith('_'): name = rrname.replace(".local", "")
+                        elif pkt.dns and pkt.dns.qname is not None:
+                            qname = pkt.dns.qname.decode('utf-8', errors='ignore').strip('.')
+                            if ".local" in qname and not qname.startswith('_'): name = qname.replace(".local", "")
+                    if not name and protocol == "mDNS": name = "Apple/Linux Device"
+                except: pass
+
+                display_name = f"{name} ({protocol})" if name else f"Private {protocol} Device"
+                self.emit("log", f"{protocol} IDENTITY SHOUT: {src}", src, None)
+                self.update_devices(src, activity, 0.005, display_name, now=ts, dst=dst, protocol=protocol)
+
+        # 4. General Traffic (Map Only)
+        elif pkt.proto and is_external_dst and "map" in detectors:
+            branch = 'general' # Already accounted (and geolocated) by the flow table
+
+        else:
+            branch = 'other'
+
+        self.counters[branch] += 1
+        return branch
+
+    def expire_flows(self, now=None, everything=False):
+        # Called about once a second by the owner (and at the end of a replay); exports idle flows
+        with self.lock:
+            if everything: return self.flows.flush(everything=True)
+            return self.flows.expire(time.time() if now is None else now)
+
+    def snapshot(self, ip, limit=None):
+        # Consistent copy of one device for a reader on another thread:
+        # (name, risk, [(activity, record), ...], {category: events per minute})
+        with self.lock:
+            dev = self.devices.get(ip)
+            if dev is None: return None
+            now = self.now()
+            return dev.name, self.risk.risk(ip, now), dev.recent(limit), self.rates(dev.rates, now)
+
+    def restore_device(self, ip, name, dropped, score, at, activities):
+        # Merge a device from a session snapshot: restored activities (oldest first) go
+        # before any seen since startup, and its decayed score adds to the live one
+        with self.lock:
+            dev = self.devices.get(ip)
+            if dev is None: dev = self.devices[ip] = Device(ip, name, self.max_activities)
+            elif name and not dev.name: dev.name = name
+            live = dev.activities
+            dev.activities = collections.OrderedDict()
+            for activity, first_seen, last_seen, hits, scored in activities:
+                if activity in live: continue
+                rec = dev.activities[sys.intern(activity)] = ActivityRecord(first_seen)
+                rec.last_seen, rec.hits, rec.scored = last_seen, hits, scored
+            dev.activities.update(live)
+            while len(dev.activities) > dev.max_activities:
+                dev.activities.popitem(last=False)
+                dropped += 1
+            dev.dropped += dropped
+            dev.version += 1
+            now = self.now()
+            self.risk.set(ip, min(1.0, self.risk.risk(ip, now) + self.risk.decayed(score, at, now)), now)
+        self.emit("device", ip)
+
+    def device_risk(self, ip):
+        with self.lock: return self.risk.risk(ip)
+
+    def max_risk(self):
+        with self.lock: return self.risk.max()
+
+    def rates(self, windows, now):
+        # Non-zero rates only; idle windows are rotated (not swept) as they are read
+        rates = {}
+        for category, window in windows.items():
+            rate = window.per_minute(now)
+            if rate: rates[category] = rate
+        return rates
+
+    def stats(self):
+        with self.lock:
+            rates = self.rates(self.category_rates, self.now())
+            return dict(self.counters, devices=len(self.devices), dedup_entries=len(self.recent), max_risk=round(self.risk.max(), 4), flows=len(self.flows),
+                        activities=sum(len(d.activities) for d in self.devices.values()),
+                        **{f"per_minute_{category}": rate for category, rate in rates.items()})
+
+
+def read_capture(path):
+    # Streams (frame_bytes, timestamp, link_class) from a pcap or pcapng file one
+    # record at a time, without Scapy dissection and without loading the file
+    from scapy.all import RawPcapReader, conf
+    return _iter_capture(RawPcapReader(path), conf)
+
+
+def _iter_capture(reader, conf):
+    with reader:
+        for data, meta in reader:
+            if hasattr(meta, 'linktype'): # pcapng: per-interface link type and timestamp resolution
+                linktype = meta.linktype
+                ts = ((meta.tshigh << 32) + meta.tslow) / meta.tsresol if meta.tshigh is not None else 0.0
+            else:
+                linktype = reader.linktype
+                ts = meta.sec + meta.usec / (1e9 if getattr(reader, 'nano', False) else 1e6)
+            yield data, ts, conf.l2types.num2layer.get(linktype, conf.raw_layer)
+
+
+def replay_capture(engine, path, realtime=False, speed=1.0):
+    # Feed a capture file through the engine, as fast as possible or at its
+    # original pacing (scaled by speed). Returns (frames, elapsed seconds).
+    records = read_capture(path) # opened (and Scapy imported) before the clock starts
+    frames = 0
+    start = time.perf_counter()
+    first_ts = None
+    for data, ts, kind in records:
+        if realtime:
+            if first_ts is None: first_ts = ts
+            delay = (ts - first_ts) / speed - (time.perf_counter() - start)
+            if delay > 0: time.sleep(delay)
+        engine.process_raw(data, ts, kind)
+        frames += 1
+    engine.expire_flows(everything=True)
+    return frames, time.perf_counter() - start
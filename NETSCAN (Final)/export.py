@@ -0,0 +1,117 @@
+import collections
+import datetime
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+
+class EventExporter:
+    # Opt-in structured event log. write() only appends to an in-memory deque
+    # (never blocks, drops when max_queue is reached); a background thread
+    # serializes batches to JSON Lines and rotates the file by size or age.
+    # Rotated files are gzip-compressed when compress is set, so the live file
+    # stays readable with tail -f.
+    def __init__(self, directory, prefix="netscan-events", max_bytes=64 * 2 ** 20, max_age=3600.0,
+                 compress=True, batch_size=2000, flush_interval=1.0, max_queue=200000):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.queue = collections.deque()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.file = None
+        self.path = None
+        self.opened_at = 0.0
+        self.size = 0
+        self.seq = 0
+        self.written = 0
+        self.dropped = 0
+        self.files = 0
+        self.bytes = 0
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="event-export", daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self, record):
+        # Called from analysis threads: O(1), no I/O, no locks
+        if len(self.queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self.queue.append(record)
+        if len(self.queue) >= self.batch_size: self.wake.set()
+
+    def _open(self):
+        self.seq += 1
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(self.directory, f"{self.prefix}-{stamp}-{self.seq:04d}.jsonl")
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.opened_at = time.monotonic()
+        self.size = 0
+        self.files += 1
+
+    def _close(self):
+        if not self.file: return
+        self.file.close()
+        self.file = None
+        if self.compress and self.size:
+            try:
+                with open(self.path, "rb") as src, gzip.open(f"{self.path}.gz", "wb", compresslevel=5) as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            except OSError: pass
+        elif not self.size:
+            try: os.remove(self.path)
+            except OSError: pass
+
+    def _drain(self):
+        lines = []
+        queue = self.queue
+        while queue:
+            try: record = queue.popleft()
+            except IndexError: break
+            lines.append(json.dumps(record, separators=(",", ":")))
+            if len(lines) >= self.batch_size: break
+        if not lines: return False
+        if self.file is None: self._open()
+        chunk = "\n".join(lines) + "\n"
+        self.file.write(chunk)
+        self.file.flush()
+        self.size += len(chunk)
+        self.bytes += len(chunk)
+        self.written += len(lines)
+        return True
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                while self._drain():
+                    if self.size >= self.max_bytes: self._close()
+                if self.file and time.monotonic() - self.opened_at >= self.max_age: self._close()
+            except OSError: # Disk full / removed directory: shed the backlog and keep running
+                self.dropped += len(self.queue)
+                self.queue.clear()
+        while self._drain(): pass
+        self._close()
+
+    def close(self):
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread: self.thread.join(5.0)
+
+    def stats(self):
+        return {'written': self.written, 'dropped': self.dropped, 'queued': len(self.queue), 'files': self.files,
+                'bytes': self.bytes}
@@ -0,0 +1,151 @@
+import socket
+import struct
+
+# Link-layer header length per capture class name (what recv_raw reports)
+LINK_HEADERS = {'Ether': 14, 'CookedLinux': 16, 'CookedLinuxV2': 20, 'Loopback': 4, 'IP': 0}
+ETH_P_IP, ETH_P_8021Q = 0x0800, 0x8100
+DNS_PORTS = (53, 5353)
+# Record types Scapy dissects into dedicated classes (SRV, NSEC, ...) rather than DNSRR
+SPECIAL_RR_TYPES = {6, 13, 15, 33, 35, 41, 43, 46, 47, 48, 50, 51, 64, 65, 250, 32769}
+
+_u16 = struct.Struct("!H").unpack_from
+_dns_header = struct.Struct("!HHHHHH").unpack_from
+
+
+class Unusual(Exception):
+    # Raised for frames the fast path does not handle; the caller dissects them with Scapy
+    pass
+
+
+class DnsInfo:
+    __slots__ = ('qr', 'qname', 'rrname')
+
+    def __init__(self, qr, qname=None, rrname=None):
+        self.qr = qr
+        self.qname = qname      # first question name, e.g. b"example.com."
+        self.rrname = rrname    # first plain resource record name (only parsed for mDNS)
+
+
+class Frame:
+    # The fields of a packet the detectors look at, whichever parser produced them
+    __slots__ = ('src', 'dst', 'length', 'proto', 'sport', 'dport', 'payload', 'dns')
+
+    def __init__(self, src, dst, length=0, proto=None, sport=0, dport=0, payload=b"", dns=None):
+        self.src = src
+        self.dst = dst
+        self.length = length    # IP total length (on the wire, not the captured snaplen)
+        self.proto = proto      # "TCP", "UDP" or None
+        self.sport = sport
+        self.dport = dport
+        self.payload = payload
+        self.dns = dns
+
+
+def read_name(buf, off):
+    labels = []
+    end = None
+    hops = 0
+    while True:
+        if off >= len(buf): raise Unusual("truncated name")
+        n = buf[off]
+        if n == 0:
+            off += 1
+            break
+        if n & 0xC0 == 0xC0:
+            if off + 1 >= len(buf) or hops > 16: raise Unusual("bad pointer")
+            if end is None: end = off + 2
+            off = ((n & 0x3F) << 8) | buf[off + 1]
+            hops += 1
+            continue
+        if n & 0xC0: raise Unusual("extended label")
+        labels.append(bytes(buf[off + 1:off + 1 + n]))
+        off += 1 + n
+    return b".".join(labels) + b".", (end if end is not None else off)
+
+
+def parse_dns(buf, want_rr):
+    if len(buf) < 12: raise Unusual("short DNS header")
+    _, flags, qdcount, ancount, nscount, arcount = _dns_header(buf, 0)
+    off = 12
+    qname = None
+    for i in range(qdcount):
+        name, off = read_name(buf, off)
+        if i == 0: qname = name
+        off += 4
+    rrname = None
+    if want_rr:
+        for _ in range(ancount + nscount + arcount):
+            name, off = read_name(buf, off)
+            if off + 10 > len(buf): raise Unusual("truncated record")
+            rtype, rdlen = _u16(buf, off)[0], _u16(buf, off + 8)[0]
+            off += 10 + rdlen
+            if rtype not in SPECIAL_RR_TYPES:
+                rrname = name
+                break
+    return DnsInfo(flags >> 15, qname, rrname)
+
+
+def parse_frame(data, kind):
+    # Returns a Frame, None for non-IPv4 traffic, or raises Unusual
+    off = LINK_HEADERS.get(getattr(kind, '__name__', None))
+    if off is None: raise Unusual("link type")
+    if off == 14:
+        ethertype = _u16(data, 12)[0] if len(data) >= 14 else 0
+        if ethertype == ETH_P_8021Q:
+            ethertype = _u16(data, 16)[0] if len(data) >= 18 else 0
+            off = 18
+        if ethertype != ETH_P_IP: return None
+    elif off == 16:
+        if len(data) < 16 or _u16(data, 14)[0] != ETH_P_IP: return None
+    elif off == 20:
+        if len(data) < 20 or _u16(data, 0)[0] != ETH_P_IP: return None
+    elif off == 4:
+        if len(data) < 4 or data[0] + data[3] != 2: return None # AF_INET in either byte order
+
+    if len(data) < off + 20 or data[off] >> 4 != 4: return None
+    ihl = (data[off] & 0x0F) * 4
+    if ihl < 20: raise Unusual("bad IHL")
+    if _u16(data, off + 6)[0] & 0x3FFF: raise Unusual("fragment")
+    length = _u16(data, off + 2)[0]
+    end = min(len(data), off + length)
+    proto = data[off + 9]
+    frame = Frame(socket.inet_ntoa(data[off + 12:off + 16]), socket.inet_ntoa(data[off + 16:off + 20]), length)
+    l4 = off + ihl
+
+    if proto == 17:
+        if end < l4 + 8: raise Unusual("short UDP")
+        frame.proto = "UDP"
+        frame.sport, frame.dport, ulen = _u16(data, l4)[0], _u16(data, l4 + 2)[0], _u16(data, l4 + 4)[0]
+        if ulen >= 8: end = min(end, l4 + ulen)
+        frame.payload = bytes(data[l4 + 8:end])
+        if frame.sport in DNS_PORTS or frame.dport in DNS_PORTS:
+            frame.dns = parse_dns(frame.payload, 5353 in (frame.sport, frame.dport))
+    elif proto == 6:
+        if end < l4 + 20: raise Unusual("short TCP")
+        frame.proto = "TCP"
+        frame.sport, frame.dport = _u16(data, l4)[0], _u16(data, l4 + 2)[0]
+        if frame.sport == 53 or frame.dport == 53: raise Unusual("DNS over TCP")
+        frame.payload = bytes(data[l4 + (data[l4 + 12] >> 4) * 4:end])
+    return frame
+
+
+def frame_from_scapy(pkt):
+    # Slow path: build the same Frame from a fully dissected Scapy packet
+    if not pkt.haslayer('IP'): return None
+    frame = Frame(pkt['IP'].src, pkt['IP'].dst, pkt['IP'].len or 0)
+    for proto in ("TCP", "UDP"):
+        if pkt.haslayer(proto):
+            layer = pkt[proto]
+            frame.proto, frame.sport, frame.dport = proto, layer.sport, layer.dport
+            frame.payload = bytes(layer.payload)
+            break
+    if pkt.haslayer('DNS'):
+        qd, rr = pkt.getlayer('DNSQR'), pkt.getlayer('DNSRR')
+        frame.dns = DnsInfo(pkt.getlayer('DNS').qr, qd.qname if qd else None, rr.rrname if rr else None)
+    return frame
+
+
+def classify(data, kind):
+    try: return parse_frame(data, kind)
+    except (Unusual, struct.error, IndexError, OSError):
+        return frame_from_scapy(kind(data))
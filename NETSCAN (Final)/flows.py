@@ -0,0 +1,95 @@
+import collections
+
+
+class Flow:
+    __slots__ = ('key', 'first', 'last', 'packets', 'bytes')
+
+    def __init__(self, key, ts):
+        self.key = key     # (src, dst, proto, sport, dport)
+        self.first = ts
+        self.last = ts
+        self.packets = 0
+        self.bytes = 0
+
+    def record(self, sampling):
+        src, dst, proto, sport, dport = self.key
+        return {'src': src, 'dst': dst, 'proto': proto, 'sport': sport, 'dport': dport, 'first': self.first,
+                'last': self.last, 'packets': self.packets, 'bytes': self.bytes, 'sampling': sampling}
+
+
+class FlowTable:
+    # NetFlow-style 5-tuple table. Flows sit in an OrderedDict in order of last
+    # activity, so idle expiry only looks at the front. A flow is exported (as
+    # an aggregated record) when it goes idle, when it has been active for
+    # active_timeout (then it restarts with fresh counters), or when the table
+    # is full. on_new(flow) runs once per created flow; with sample_rate N only
+    # every Nth packet is counted and its numbers are scaled by N.
+    def __init__(self, on_new=None, on_export=None, idle_timeout=15.0, active_timeout=60.0,
+                 sample_rate=1, max_flows=65536):
+        self.on_new = on_new
+        self.on_export = on_export
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.sample_rate = max(1, sample_rate)
+        self.max_flows = max_flows
+        self.flows = collections.OrderedDict() # key -> Flow
+        self.pending = []                      # records waiting for the next flush
+        self.tick = 0
+        self.last_expiry = None
+        self.created = 0
+        self.exported = 0
+        self.evicted = 0
+        self.skipped = 0
+
+    def observe(self, key, ts, length):
+        self.tick += 1
+        if self.tick % self.sample_rate:
+            self.skipped += 1
+            return None
+        flow = self.flows.get(key)
+        if flow is None:
+            if len(self.flows) >= self.max_flows:
+                self._export(self.flows.popitem(last=False)[1])
+                self.evicted += 1
+            flow = self.flows[key] = Flow(key, ts)
+            self.created += 1
+            if self.on_new: self.on_new(flow)
+        else:
+            self.flows.move_to_end(key)
+            if ts - flow.first >= self.active_timeout:
+                self._export(flow)
+                flow.first, flow.packets, flow.bytes = ts, 0, 0
+        flow.last = ts
+        flow.packets += self.sample_rate
+        flow.bytes += length * self.sample_rate
+        if self.last_expiry is None or ts - self.last_expiry >= 1.0: self.expire(ts)
+        return flow
+
+    def _export(self, flow):
+        if flow.packets: self.pending.append(flow.record(self.sample_rate))
+
+    def expire(self, now):
+        # Export idle flows (oldest activity first) and hand pending records to on_export
+        self.last_expiry = now
+        while self.flows:
+            flow = next(iter(self.flows.values()))
+            if now - flow.last < self.idle_timeout: break
+            self.flows.popitem(last=False)
+            self._export(flow)
+        return self.flush()
+
+    def flush(self, everything=False):
+        if everything:
+            for flow in self.flows.values(): self._export(flow)
+            self.flows.clear()
+        records, self.pending = self.pending, []
+        self.exported += len(records)
+        if records and self.on_export: self.on_export(records)
+        return records
+
+    def __len__(self):
+        return len(self.flows)
+
+    def stats(self):
+        return {'active': len(self.flows), 'created': self.created, 'exported': self.exported,
+                'evicted': self.evicted, 'sampled_out': self.skipped, 'sample_rate': self.sample_rate}
@@ -0,0 +1,382 @@
+import bisect
+import csv
+import queue
+import socket
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+PRIVATE_PREFIXES = ("10.", "192.168.", "172.16.", "127.")
+
+
+def is_private_ip(ip):
+    return ip.startswith(PRIVATE_PREFIXES)
+
+
+def ip_to_int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+# --- PROVIDERS ---
+# A provider exposes lookup(ip) -> (lat, lon, city) or None, and may raise on
+# transient errors. LocationChain asks each provider in turn.
+
+class LookupDeferred(Exception):
+    # Some IPs could not be answered now (provider error, rate limit). `results`
+    # holds the ones that were; retry_after is how long to hold off (0: no wait).
+    def __init__(self, message, results=None, retry_after=0.0):
+        super().__init__(message)
+        self.results = results or {}
+        self.retry_after = retry_after
+
+
+class RangeDatabase:
+    # Offline IPv4 range table held in sorted, compact integer arrays.
+    # Accepted CSV layouts (IPv6 rows are skipped):
+    #   start,end,lat,lon,city                                    (with or without header)
+    #   start,end,continent,country,region,city,lat,lon           (DB-IP "city lite")
+    # start/end may be dotted quads or integers.
+    def __init__(self, path=None):
+        self.path = path
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lats = array('f')
+        self.lons = array('f')
+        self.city_ids = array('I')
+        self.cities = []
+        self.loaded = path is None
+        self.failed = None # load error; the table then stays empty instead of being reloaded
+        self.load_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def load(self):
+        with self.load_lock:
+            if self.loaded: return
+            try:
+                with open(self.path, newline='', encoding='utf-8', errors='ignore') as f:
+                    self.load_rows(csv.reader(f))
+            except (OSError, ValueError, csv.Error) as e:
+                self.failed = e
+                raise
+            finally:
+                self.loaded = True
+
+    def load_rows(self, rows):
+        city_index = {}
+        entries = []
+        for row in rows:
+            if len(row) < 5 or ':' in row[0]: continue
+            if len(row) >= 8: lat, lon, city = row[6], row[7], row[5]
+            else: lat, lon, city = row[2], row[3], row[4]
+            try:
+                start, end = self._addr(row[0]), self._addr(row[1])
+                lat, lon = float(lat), float(lon)
+            except (ValueError, OSError):
+                continue # header or malformed row
+            if city not in city_index:
+                city_index[city] = len(self.cities)
+                self.cities.append(city)
+            entries.append((start, end, lat, lon, city_index[city]))
+        entries.sort()
+        for start, end, lat, lon, cid in entries:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.lats.append(lat)
+            self.lons.append(lon)
+            self.city_ids.append(cid)
+
+    def _addr(self, value):
+        value = value.strip()
+        return int(value) if value.isdigit() else ip_to_int(value)
+
+    def lookup(self, ip):
+        if not self.loaded: self.load()
+        try: n = ip_to_int(ip)
+        except OSError: return None
+        i = bisect.bisect_right(self.starts, n) - 1
+        if i < 0 or n > self.ends[i]: return None
+        return round(self.lats[i], 4), round(self.lons[i], 4), self.cities[self.city_ids[i]]
+
+
+class IpApiProvider:
+    # Online fallback against ip-api.com over one pooled keep-alive session.
+    # lookup_many() resolves up to 100 IPs per POST to the /batch endpoint.
+    # Every response says how many requests are left in the current window
+    # (X-Rl) and when it resets (X-Ttl). Once none are left, or on a 429, no
+    # request is sent until the reset and lookups raise LookupDeferred, since
+    # going over the limit gets the host banned.
+    BATCH_LIMIT = 100
+    FIELDS = "status,city,lat,lon,query"
+
+    def __init__(self, base_url="http://ip-api.com", timeout=2, session=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        if session is None:
+            import requests
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.requests_sent = 0
+        self.rate_limited = 0
+        self.blocked_until = 0.0 # monotonic time the exhausted window resets
+
+    def _check_limit(self, results=None):
+        wait = self.blocked_until - time.monotonic()
+        if wait > 0: raise LookupDeferred(f"ip-api rate limit, next request in {wait:.0f}s", results, wait)
+
+    def _track_limit(self, response):
+        try: left, ttl = int(response.headers.get("X-Rl", 1)), int(response.headers.get("X-Ttl", 60))
+        except ValueError: left, ttl = 1, 60
+        if response.status_code == 429: self.rate_limited += 1
+        if left <= 0 or response.status_code == 429:
+            self.blocked_until = time.monotonic() + max(ttl, 1)
+
+    def _parse(self, entry):
+        if entry.get("status") == "success":
+            return entry["lat"], entry["lon"], entry["city"]
+        return None
+
+    def lookup(self, ip):
+        self._check_limit()
+        self.requests_sent += 1
+        response = self.session.get(f"{self.base_url}/json/{ip}", params={"fields": self.FIELDS}, timeout=self.timeout)
+        self._track_limit(response)
+        if response.status_code == 429: self._check_limit()
+        response.raise_for_status()
+        return self._parse(response.json())
+
+    def lookup_many(self, ips):
+        results = {}
+        for i in range(0, len(ips), self.BATCH_LIMIT):
+            chunk = ips[i:i + self.BATCH_LIMIT]
+            self._check_limit(results)
+            self.requests_sent += 1
+            response = self.session.post(f"{self.base_url}/batch", params={"fields": self.FIELDS},
+                                         json=chunk, timeout=self.timeout)
+            self._track_limit(response)
+            if response.status_code == 429: self._check_limit(results)
+            response.raise_for_status()
+            for ip, entry in zip(chunk, response.json()):
+                location = self._parse(entry)
+                if location: results[entry.get("query", ip)] = location
+        return results
+
+
+class LocationChain:
+    # A provider that raises is skipped and the next one asked; on_error(provider,
+    # error) hears about its first failure in a row. IPs left unanswered because
+    # of an error raise LookupDeferred, so they are not taken as misses.
+    def __init__(self, providers, on_error=None):
+        self.providers = list(providers)
+        self.on_error = on_error
+        self.failing = set() # providers whose last call raised
+
+    def _failed(self, provider, error):
+        if provider in self.failing: return
+        self.failing.add(provider)
+        if self.on_error: self.on_error(provider, error)
+
+    def lookup(self, ip):
+        error = None
+        for provider in self.providers:
+            try: location = provider.lookup(ip)
+            except Exception as e:
+                self._failed(provider, e)
+                error = e
+                continue
+            self.failing.discard(provider)
+            if location: return location
+            error = None # a later provider's definite miss stands
+        if error: raise LookupDeferred(str(error), retry_after=getattr(error, 'retry_after', 0.0))
+        return None
+
+    def lookup_many(self, ips):
+        # Each provider only sees the IPs the previous ones could not answer
+        results = {}
+        remaining = list(ips)
+        error = None
+        for provider in self.providers:
+            if not remaining: break
+            try:
+                if hasattr(provider, 'lookup_many'):
+                    found = provider.lookup_many(remaining)
+                else:
+                    found = {ip: loc for ip in remaining for loc in [provider.lookup(ip)] if loc}
+            except LookupDeferred as e:
+                found, error = e.results, e
+            except Exception as e:
+                self._failed(provider, e)
+                found, error = {}, e
+            else:
+                self.failing.discard(provider)
+                error = None
+            results.update(found)
+            remaining = [ip for ip in remaining if ip not in found]
+        if error and remaining: raise LookupDeferred(str(error), results, getattr(error, 'retry_after', 0.0))
+        return results
+
+
+class GeoLocator:
+    # Fixed pool of lookup workers fed by a bounded, deduplicating queue.
+    # resolve(ip) returns (lat, lon, city), None for a definitive miss, or raises
+    # on a transient error (the IP may then be submitted again later).
+    # With resolve_many, each worker instead collects up to batch_size IPs for at
+    # most batch_window seconds and resolves them in one call (ip -> location).
+    # max_known bounds the answered locations and the seen IPs (oldest dropped
+    # first); a dropped IP is looked up again if it shows up, usually from cache.
+    # LookupDeferred with retry_after (a rate limit) pauses every worker for
+    # that long and puts the unanswered IPs back in the queue.
+    def __init__(self, resolve, on_result, workers=4, max_queue=256,
+                 resolve_many=None, batch_size=100, batch_window=0.25, max_known=None):
+        self.resolve = resolve
+        self.resolve_many = resolve_many
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.on_result = on_result
+        self.workers = workers
+        self.max_known = max_known
+        self.locations = OrderedDict() # IP -> (lat, lon, city), oldest answer first
+        self.seen = OrderedDict()      # IP -> None: queued, in flight or already answered
+        self.evicted = 0               # locations dropped from the front so far
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.threads = []
+        self.stopped = threading.Event()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.max_depth = 0
+        self.counters = {'submitted': 0, 'dropped': 0, 'resolved': 0, 'failed': 0, 'batches': 0, 'requeued': 0}
+
+    def start(self):
+        if self.threads: return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"geo-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        self.stopped.set()
+        for _ in self.threads:
+            try: self.queue.put_nowait(None)
+            except queue.Full: pass
+        self.threads = []
+
+    def submit(self, ip):
+        # Fast path: known or pending IPs cost one set lookup, no lock, no thread
+        if ip in self.seen or is_private_ip(ip): return False
+        with self.lock:
+            if ip in self.seen: return False
+            try:
+                self.queue.put_nowait(ip)
+            except queue.Full:
+                self.counters['dropped'] += 1
+                return False
+            self.seen[ip] = None
+            self.counters['submitted'] += 1
+            self._trim()
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def preload(self, ip, location):
+        # Restored from a session snapshot: known without a lookup
+        with self.lock:
+            self.seen[ip] = None
+            self.locations[ip] = location
+            self._trim()
+
+    def _trim(self):
+        # Called with the lock held
+        if not self.max_known: return
+        while len(self.locations) > self.max_known:
+            self.locations.popitem(last=False)
+            self.evicted += 1
+        while len(self.seen) > self.max_known:
+            self.seen.popitem(last=False)
+
+    def _next_batch(self):
+        ip = self.queue.get()
+        if ip is None: return None, True
+        batch = [ip]
+        if not self.resolve_many: return batch, False
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try: ip = self.queue.get(timeout=remaining)
+            except queue.Empty: break
+            if ip is None: return batch, True
+            batch.append(ip)
+        return batch, False
+
+    def _worker(self):
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                if not self._hold(): return
+                self._resolve_batch(batch)
+            if stopping: return
+
+    def _hold(self):
+        # Waits out a rate limit pause; False when stopping
+        while True:
+            wait = self.paused_until - time.monotonic()
+            if wait <= 0: return True
+            if self.stopped.wait(wait): return False
+
+    def _resolve_batch(self, batch):
+        with self.lock:
+            self.in_flight += len(batch)
+            self.counters['batches'] += 1
+        deferred = None
+        try:
+            if self.resolve_many: results = self.resolve_many(batch)
+            else: results = {batch[0]: self.resolve(batch[0])}
+        except LookupDeferred as e:
+            results, deferred = e.results, e
+        except Exception:
+            # Transient failure: forget the IPs so later packets can retry them
+            with self.lock:
+                for ip in batch: self.seen.pop(ip, None)
+                self.counters['failed'] += len(batch)
+                self.in_flight -= len(batch)
+            return
+        requeue = []
+        with self.lock:
+            self.in_flight -= len(batch)
+            if deferred: # Answer what came back; retry the rest after the pause, or on later packets
+                if deferred.retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + deferred.retry_after)
+                    requeue = [ip for ip in batch if ip not in results]
+                else:
+                    for ip in batch:
+                        if ip not in results: self.seen.pop(ip, None)
+            resolved = sum(1 for ip in batch if results.get(ip))
+            self.counters['resolved'] += resolved
+            self.counters['failed'] += len(batch) - resolved - len(requeue)
+            self.counters['requeued'] += len(requeue)
+            for ip in batch:
+                if results.get(ip): self.locations[ip] = results[ip]
+            self._trim()
+        for ip in requeue:
+            try: self.queue.put_nowait(ip)
+            except queue.Full:
+                with self.lock:
+                    self.seen.pop(ip, None)
+                    self.counters['dropped'] += 1
+        for ip in batch:
+            location = results.get(ip)
+            if not location: continue
+            try: self.on_result(ip, location)
+            except Exception: pass
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, queue_depth=self.queue.qsize(), max_depth=self.max_depth,
+                        in_flight=self.in_flight, known=len(self.locations), evicted=self.evicted,
+                        paused=round(max(0.0, self.paused_until - time.monotonic()), 1))
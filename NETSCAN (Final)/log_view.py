@@ -0,0 +1,120 @@
+import collections
+import datetime
+import itertools
+
+
+class LogEntry:
+    __slots__ = ('stamp', 'message', 'ip', 'host_ip', 'tag')
+
+    def __init__(self, stamp, message, ip, host_ip, tag):
+        self.stamp = stamp
+        self.message = message
+        self.ip = ip            # device selected when the line is clicked
+        self.host_ip = host_ip  # raw IP shown until its reverse DNS name arrives
+        self.tag = tag
+
+
+def severity_tag(message):
+    if "UNSECURED" in message or "CRITICAL" in message or "ERROR" in message: return "danger"
+    if "DNS" in message or "RESOLVED" in message: return "warning"
+    if "IDENTITY" in message or "BROADCAST" in message or "mDNS" in message: return "safe"
+    return "info"
+
+
+class LogConsole:
+    # Bounded, virtualized activity log. Entries live in a fixed-capacity ring
+    # (oldest trimmed one at a time) and only the rows that fit in the textbox
+    # are inserted. One click/hover handler maps the row under the mouse back to
+    # its entry, so no per-line tags or bindings are ever created.
+    def __init__(self, textbox, on_select, capacity=5000):
+        self.textbox = textbox
+        self.on_select = on_select
+        self.entries = collections.deque(maxlen=capacity)
+        self.window = []       # entries currently rendered, top to bottom
+        self.offset = 0        # rows scrolled up from the newest entry (0 = follow)
+        self.hover_row = None
+        self.line_height = None
+        self.dirty = False
+        self.trimmed = 0
+
+        textbox.tag_config("hover", underline=True)
+        textbox.bind("<Button-1>", self._on_click)
+        textbox.bind("<Motion>", self._on_motion)
+        textbox.bind("<Leave>", lambda e: self._set_hover(None))
+        textbox.bind("<MouseWheel>", lambda e: self.scroll(3 if e.delta > 0 else -3))
+        textbox.bind("<Button-4>", lambda e: self.scroll(3))
+        textbox.bind("<Button-5>", lambda e: self.scroll(-3))
+        textbox.bind("<Configure>", lambda e: self._touch())
+
+    def _touch(self):
+        self.dirty = True
+
+    def append(self, message, ip=None, host_ip=None):
+        if len(self.entries) == self.entries.maxlen: self.trimmed += 1
+        stamp = datetime.datetime.now().strftime("%H:%M:%S")
+        self.entries.append(LogEntry(stamp, message, ip, host_ip, severity_tag(message)))
+        if self.offset: self.offset += 1 # Keep a scrolled-back view anchored on the same lines
+        self.dirty = True
+
+    def rename_host(self, host_ip, name):
+        for entry in self.entries:
+            if entry.host_ip == host_ip:
+                head, tail = entry.message.rsplit(host_ip, 1)
+                entry.message, entry.host_ip = f"{head}{name}{tail}", None
+                self.dirty = True
+
+    def clear(self):
+        self.entries.clear()
+        self.offset = 0
+        self.dirty = True
+
+    def scroll(self, rows):
+        self.offset = max(0, self.offset + rows)
+        self.dirty = True
+        self.render()
+
+    def visible_rows(self):
+        if not self.line_height:
+            info = self.textbox.dlineinfo("1.0")
+            if info: self.line_height = info[3]
+        return max(1, self.textbox.winfo_height() // (self.line_height or 16))
+
+    def render(self):
+        if not self.dirty: return
+        self.dirty = False
+        rows = self.visible_rows()
+        total = len(self.entries)
+        self.offset = max(0, min(self.offset, total - rows))
+        end = total - self.offset
+        self.window = list(itertools.islice(self.entries, max(0, end - rows), end))
+        self.hover_row = None
+        self.textbox.configure(state="normal")
+        self.textbox.delete("1.0", "end")
+        for i, entry in enumerate(self.window):
+            prefix = "\n" if i else ""
+            self.textbox.insert("end", f"{prefix}[{entry.stamp}] {entry.message}", (entry.tag,))
+        self.textbox.configure(state="disabled")
+
+    def _entry_at(self, event):
+        row = int(self.textbox.index(f"@{event.x},{event.y}").split('.')[0]) - 1
+        if 0 <= row < len(self.window): return row, self.window[row]
+        return None, None
+
+    def _on_click(self, event):
+        _, entry = self._entry_at(event)
+        if entry and entry.ip: self.on_select(entry.ip)
+
+    def _on_motion(self, event):
+        row, entry = self._entry_at(event)
+        self._set_hover(row if entry and entry.ip else None)
+
+    def _set_hover(self, row):
+        if row == self.hover_row: return
+        self.hover_row = row
+        self.textbox.tag_remove("hover", "1.0", "end")
+        if row is not None: self.textbox.tag_add("hover", f"{row + 1}.0", f"{row + 1}.end")
+        self.textbox.configure(cursor="hand2" if row is not None else "")
+
+    def stats(self):
+        return {'entries': len(self.entries), 'capacity': self.entries.maxlen, 'trimmed': self.trimmed,
+                'rendered_rows': len(self.window)}
@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+MISS = object()
+
+
+class CacheDatabase:
+    # One SQLite file shared by every LookupCache. Writes are buffered and
+    # committed in batches so lookups never wait on an fsync per entry; the
+    # last_used time of cache hits goes out with the same batches.
+    def __init__(self, path=":memory:", flush_every=64, flush_interval=30.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+        self.lock = threading.RLock()
+        self.pending = {}     # (kind, key) -> (value_json, expires, last_used)
+        self.caches = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (kind TEXT, key TEXT, value TEXT, "
+                          "expires REAL, last_used REAL, PRIMARY KEY (kind, key))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (kind, last_used)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (kind, expires)")
+        self.conn.commit()
+
+    def write(self, kind, key, row):
+        with self.lock:
+            self.pending[(kind, key)] = row
+            if len(self.pending) >= self.flush_every or time.monotonic() - self.last_flush > self.flush_interval:
+                self.flush()
+
+    def load(self, kind, limit):
+        with self.lock:
+            return self.conn.execute("SELECT key, value, expires, last_used FROM entries WHERE kind=? AND expires>? "
+                                     "ORDER BY last_used DESC LIMIT ?", (kind, time.time(), limit)).fetchall()
+
+    def flush(self):
+        with self.lock:
+            self.last_flush = time.monotonic()
+            touched = [(used, cache.kind, key) for cache in self.caches for key, used in cache._take_touched()]
+            if not self.pending and not touched: return
+            rows = [(kind, key, *row) for (kind, key), row in self.pending.items()]
+            self.pending = {}
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.executemany("UPDATE entries SET last_used=? WHERE kind=? AND key=?", touched)
+            for cache in self.caches: cache._trim_disk()
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+
+class LookupCache:
+    # In-memory LRU over one namespace ("kind") of a CacheDatabase.
+    # put(key, None) records a negative result, which expires after negative_ttl.
+    # get() returns the cached value (possibly None) or MISS.
+    def __init__(self, db, kind, ttl, negative_ttl, max_entries):
+        self.db = db
+        self.kind = kind
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (value, expires)
+        self.touched = {}             # key -> time of its last hit, not yet written
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'warm_loaded': 0}
+        db.caches.append(self)
+        self._warm_load()
+
+    def _warm_load(self):
+        rows = self.db.load(self.kind, self.max_entries)
+        with self.lock:
+            for key, value, expires, _ in reversed(rows): # oldest first so LRU order is preserved
+                self.entries[key] = (json.loads(value), expires)
+            self.counters['warm_loaded'] = len(rows)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return MISS
+            value, expires = entry
+            now = time.time()
+            if expires <= now:
+                del self.entries[key]
+                self.counters['expired'] += 1
+                self.counters['misses'] += 1
+                return MISS
+            self.entries.move_to_end(key)
+            self.touched[key] = now
+            self.counters['hits' if value is not None else 'negative_hits'] += 1
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        expires = now + (self.ttl if value is not None else self.negative_ttl)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+        self.db.write(self.kind, key, (json.dumps(value), expires, now))
+
+    def _take_touched(self):
+        with self.lock:
+            touched, self.touched = self.touched, {}
+        return touched.items()
+
+    def _trim_disk(self):
+        # Called by CacheDatabase.flush with its lock held. Both statements walk an index;
+        # the LRU delete only runs once the table holds more than max_entries rows.
+        conn = self.db.conn
+        conn.execute("DELETE FROM entries WHERE kind=? AND expires<=?", (self.kind, time.time()))
+        over = conn.execute("SELECT last_used FROM entries WHERE kind=? ORDER BY last_used DESC LIMIT 1 OFFSET ?",
+                            (self.kind, self.max_entries)).fetchone()
+        if over: conn.execute("DELETE FROM entries WHERE kind=? AND last_used<=?", (self.kind, over[0]))
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['hits'] + self.counters['negative_hits'] + self.counters['misses']
+            hit_rate = (lookups - self.counters['misses']) / lookups if lookups else 0.0
+            return dict(self.counters, size=len(self.entries), hit_rate=round(hit_rate, 3))
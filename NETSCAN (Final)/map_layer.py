@@ -0,0 +1,129 @@
+import math
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB": return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def world_position(lat, lon):
+    # Web-Mercator position at zoom 0 (tile units); multiply by 2**zoom for any level
+    lat = max(-85.0511, min(85.0511, lat))
+    lat_rad = math.radians(lat)
+    return (lon + 180.0) / 360.0, (1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2.0
+
+
+class CityPoint:
+    __slots__ = ('city', 'lat', 'lon', 'wx', 'wy', 'nodes', 'label', 'bytes')
+
+    def __init__(self, city, lat, lon, label):
+        self.city = city
+        self.lat = lat
+        self.lon = lon
+        self.wx, self.wy = world_position(lat, lon)
+        self.nodes = 0
+        self.label = label # first IP seen, replaced by the node count once there are several
+        self.bytes = 0
+
+
+class MarkerLayer:
+    # Map markers as a derived view over per-city points. Updates only touch
+    # the model; flush() (called at a fixed rate while the map is visible)
+    # groups cities into screen-space grid cells for the current zoom, drops
+    # cells outside the viewport and applies the difference to the widget, so
+    # tkintermapview sees at most one marker per visible cell and no redraws
+    # for unchanged ones. map_widget may be None until the map is first
+    # opened; the model keeps filling in and the first flush draws it all.
+    def __init__(self, map_widget, on_click=None, cell_px=64, margin_cells=1):
+        self.map_widget = map_widget
+        self.on_click = on_click
+        self.cell_px = cell_px
+        self.margin_cells = margin_cells
+        self.cities = {}       # city -> CityPoint
+        self.markers = {}      # cell -> (marker, lat, lon, text)
+        self.show_names = True
+        self.dirty = False
+        self.view = None       # (zoom, viewport in cells) of the last flush
+        self.flushes = 0
+        self.culled = 0
+
+    def add_node(self, lat, lon, city, ip):
+        point = self.cities.get(city)
+        if point is None: point = self.cities[city] = CityPoint(city, lat, lon, ip)
+        point.nodes += 1
+        if point.nodes > 1: point.label = f"{point.nodes} Nodes"
+        self.dirty = True
+
+    def add_volume(self, city, nbytes):
+        point = self.cities.get(city)
+        if point is None or not nbytes: return False
+        point.bytes += nbytes
+        self.dirty = True
+        return True
+
+    def set_show_names(self, show):
+        self.show_names = show
+        self.dirty = True
+
+    def _viewport(self, zoom):
+        cell = self.cell_px / self.map_widget.tile_size
+        (x0, y0), (x1, y1) = self.map_widget.upper_left_tile_pos, self.map_widget.lower_right_tile_pos
+        m = self.margin_cells
+        return (zoom, int(x0 // cell) - m, int(y0 // cell) - m, int(x1 // cell) + m, int(y1 // cell) + m)
+
+    def _text(self, members):
+        if not self.show_names: return ""
+        top = max(members, key=lambda p: p.nodes)
+        volume = sum(p.bytes for p in members)
+        if len(members) == 1: label = top.label
+        else: label = f"+{len(members) - 1} cities, {sum(p.nodes for p in members)} Nodes"
+        return f"{top.city} ({label}, {format_bytes(volume)})" if volume else f"{top.city} ({label})"
+
+    def flush(self, force=False):
+        if self.map_widget is None: return
+        zoom = round(self.map_widget.zoom)
+        view = self._viewport(zoom)
+        if not (force or self.dirty or view != self.view): return
+        self.dirty = False
+        self.view = view
+        self.flushes += 1
+        _, cx0, cy0, cx1, cy1 = view
+        scale = (2 ** zoom) * self.map_widget.tile_size / self.cell_px
+        clusters = {}
+        culled = 0
+        for point in self.cities.values():
+            key = (int(point.wx * scale), int(point.wy * scale))
+            if not (cx0 <= key[0] <= cx1 and cy0 <= key[1] <= cy1):
+                culled += 1
+                continue
+            clusters.setdefault(key, []).append(point)
+        self.culled = culled
+
+        for key in [k for k in self.markers if k not in clusters]:
+            self.map_widget.delete(self.markers.pop(key)[0])
+        for key, members in clusters.items():
+            top = max(members, key=lambda p: p.nodes)
+            text = self._text(members)
+            current = self.markers.get(key)
+            if current is None:
+                marker = self.map_widget.set_marker(top.lat, top.lon, text=text, command=self._clicked)
+                self.markers[key] = (marker, top.lat, top.lon, text)
+                marker.data = members
+                continue
+            marker, lat, lon, old_text = current
+            marker.data = members
+            if (lat, lon) != (top.lat, top.lon): marker.set_position(top.lat, top.lon)
+            if text != old_text: marker.set_text(text)
+            self.markers[key] = (marker, top.lat, top.lon, text)
+
+    def _clicked(self, marker):
+        members = marker.data or []
+        if len(members) > 1: # Cluster: zoom in until it splits
+            self.map_widget.set_position(*marker.position)
+            self.map_widget.set_zoom(min(round(self.map_widget.zoom) + 2, self.map_widget.max_zoom))
+        elif self.on_click: self.on_click(marker)
+
+    def stats(self):
+        return {'cities': len(self.cities), 'markers': len(self.markers), 'culled': self.culled,
+                'flushes': self.flushes}
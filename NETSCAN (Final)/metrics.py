@@ -0,0 +1,174 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+# Latency buckets in seconds: 1us .. 1s, roughly 1-2.5-5 per decade
+LATENCY_BUCKETS = tuple(float(f"{m}e{e}") for e in range(-6, 0) for m in (1, 2.5, 5)) + (1.0,)
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    # Fixed-bucket histogram; observe() is one bisect plus two adds. Updates
+    # are not locked: a rare lost increment is acceptable for diagnostics.
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # last slot: above the largest bound
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count: return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank: return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+class _Null:
+    # Shared stand-in handed out by a disabled registry: every update is a no-op
+    __slots__ = ()
+    value = 0
+    count = 0
+
+    def inc(self, n=1): pass
+    def set(self, value): pass
+    def observe(self, value): pass
+    def quantile(self, q): return 0.0
+
+
+NULL = _Null()
+
+
+class MetricsRegistry:
+    # Counters, gauges and histograms created by name, plus collectors: the
+    # stats() callables the components already expose, read only when a
+    # snapshot is taken so they cost nothing on the hot paths. When disabled,
+    # every metric is the shared no-op and snapshots are empty.
+    def __init__(self, enabled=True, prefix="netscan"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.metrics = {}    # name -> Counter | Gauge | Histogram
+        self.collectors = {} # group -> callable returning a flat dict of numbers
+        self.lock = threading.Lock()
+
+    def _get(self, name, factory):
+        if not self.enabled: return NULL
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None: metric = self.metrics[name] = factory()
+            return metric
+
+    def counter(self, name):
+        return self._get(name, Counter)
+
+    def gauge(self, name):
+        return self._get(name, Gauge)
+
+    def histogram(self, name, bounds=LATENCY_BUCKETS):
+        return self._get(name, lambda: Histogram(bounds))
+
+    def collect(self, group, fn):
+        if self.enabled: self.collectors[group] = fn
+
+    def snapshot(self):
+        # {'counters': {...}, 'gauges': {...}, 'histograms': {name: {...}}} with collector values as gauges
+        out = {'time': time.time(), 'counters': {}, 'gauges': {}, 'histograms': {}}
+        if not self.enabled: return out
+        for name, metric in list(self.metrics.items()):
+            if isinstance(metric, Counter): out['counters'][name] = metric.value
+            elif isinstance(metric, Gauge): out['gauges'][name] = metric.value
+            else:
+                out['histograms'][name] = {'count': metric.count, 'sum': metric.sum, 'p50': metric.quantile(0.5),
+                                           'p99': metric.quantile(0.99), 'buckets': list(metric.counts)}
+        for group, fn in list(self.collectors.items()):
+            try: values = fn()
+            except Exception: continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    out['gauges'][f"{group}_{key}"] = value
+        return out
+
+    def prometheus(self, snapshot=None):
+        snap = snapshot or self.snapshot()
+        p = self.prefix
+        lines = []
+        for name, value in sorted(snap['counters'].items()):
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {value}"]
+        for name, value in sorted(snap['gauges'].items()):
+            lines += [f"# TYPE {p}_{name} gauge", f"{p}_{name} {value}"]
+        for name, hist in sorted(snap['histograms'].items()):
+            metric = self.metrics.get(name)
+            bounds = metric.bounds if metric is not None else LATENCY_BUCKETS
+            lines.append(f"# TYPE {p}_{name}_seconds histogram")
+            cumulative = 0
+            for bound, n in zip(list(bounds) + ["+Inf"], hist['buckets']):
+                cumulative += n
+                lines.append(f'{p}_{name}_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{p}_{name}_seconds_sum {hist['sum']}", f"{p}_{name}_seconds_count {hist['count']}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    # Periodically writes the registry to a local file (JSON or Prometheus
+    # text exposition format), replacing it atomically so readers never see a
+    # partial dump.
+    def __init__(self, registry, path, fmt="prometheus", interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.fmt = fmt
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.writes = 0
+
+    def start(self):
+        threading.Thread(target=self._run, name="metrics-export", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.write() # Final dump on shutdown
+
+    def write(self):
+        snap = self.registry.snapshot()
+        body = json.dumps(snap, indent=2) if self.fmt == "json" else self.registry.prometheus(snap)
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f: f.write(body)
+            os.replace(tmp, self.path)
+            self.writes += 1
+        except OSError: pass
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
@@ -0,0 +1,157 @@
+import json
+import threading
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+from devices import ActivityRecord, Device
+from risk import RiskIndex
+
+
+class RemoteEngine:
+    # Read-only mirror of a daemon's device inventory with the surface the UI
+    # reads from a local AnalysisEngine (devices, lock, snapshot, device_risk,
+    # max_risk). Risk is decayed locally from the last value the daemon served.
+    def __init__(self, half_life=1800.0):
+        self.devices = {} # IP -> devices.Device
+        self.per_minute = {} # IP -> {category: events per minute} as last served
+        self.risk = RiskIndex(half_life)
+        self.lock = threading.RLock()
+
+    def apply(self, record):
+        ip = record['ip']
+        with self.lock:
+            dev = self.devices.get(ip)
+            if dev is None: dev = self.devices[ip] = Device(ip)
+            dev.name, dev.dropped, dev.version = record['name'], record['dropped_activities'], record['version']
+            self.per_minute[ip] = record.get('per_minute', {})
+            if 'activities' in record:
+                dev.activities.clear()
+                for item in reversed(record['activities']): # Served newest first
+                    rec = dev.activities[item['activity']] = ActivityRecord(item['first_seen'])
+                    rec.last_seen, rec.hits = item['last_seen'], item['hits']
+            self.risk.set(ip, record['risk'])
+
+    def snapshot(self, ip, limit=None):
+        with self.lock:
+            dev = self.devices.get(ip)
+            if dev is None: return None
+            return dev.name, self.risk.risk(ip), dev.recent(limit), dict(self.per_minute.get(ip, {}))
+
+    def device_risk(self, ip):
+        with self.lock: return self.risk.risk(ip)
+
+    def max_risk(self):
+        with self.lock: return self.risk.max()
+
+
+class RemoteSensor:
+    # Attaches the UI to a running daemon (daemon.py) instead of capturing
+    # locally. A poll thread follows the query API with since-cursors and
+    # re-emits the same listener events a local Sensor would; start/stop
+    # capture are forwarded to the daemon. When the daemon restarts (new
+    # instance, or its seq is behind our cursors) or the event ring has moved
+    # past our cursor, every cursor goes back to 0 and the mirror resyncs.
+    def __init__(self, url, listener=None, metrics=None, interval=1.0, activities=200, page_size=500, half_life=1800.0,
+                 max_locations=None):
+        self.url = url.rstrip("/")
+        self.listener = listener or (lambda kind, *args: None)
+        self.interval = interval
+        self.activities = activities # newest activities mirrored per changed device
+        self.page_size = page_size
+        self.engine = RemoteEngine(half_life)
+        self.locations = OrderedDict() # IP -> (lat, lon, city), oldest first
+        self.max_locations = max_locations
+        self.cursors = {'/devices': 0, '/locations': 0, '/events': 0}
+        self.instance = None
+        self.capturing = False
+        self.connected = None
+        self.capture_ready = threading.Event() # Set once the daemon reports it can capture
+        self.closing = threading.Event()
+        self.counters = {'polls': 0, 'errors': 0, 'resets': 0, 'restarts': 0}
+        if metrics is not None: metrics.collect("remote", self.stats)
+        threading.Thread(target=self._poll, name="remote-poll", daemon=True).start()
+
+    def emit(self, kind, *args):
+        try: self.listener(kind, *args)
+        except Exception: pass
+
+    def request(self, path, method="GET", **params):
+        url = f"{self.url}{path}"
+        if params: url += "?" + urllib.parse.urlencode(params)
+        req = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return json.loads(resp.read())
+
+    def resync(self, instance):
+        if self.instance is not None:
+            self.counters['restarts'] += 1
+            self.emit("log", f"ATTACHED: {self.url} restarted, resyncing", None, None)
+        self.instance = instance
+        for path in self.cursors: self.cursors[path] = 0
+
+    def pages(self, path, **params):
+        # Items changed since the stored cursor, page by page; the cursor advances as pages are consumed
+        while True:
+            page = self.request(path, since=self.cursors[path], limit=self.page_size, **params)
+            if page['instance'] != self.instance or page['seq'] < self.cursors[path]:
+                self.resync(page['instance'])
+                page = self.request(path, since=0, limit=self.page_size, **params)
+            if page.get('reset') and self.cursors[path]: # Fell behind the daemon's event ring: refetch the full state too
+                self.counters['resets'] += 1
+                self.cursors['/devices'] = self.cursors['/locations'] = 0
+            yield from page['items']
+            self.cursors[path] = page['cursor']
+            if not page['more']: return
+
+    def sync(self):
+        status = self.request('/status')
+        if status['instance'] != self.instance or status['seq'] < max(self.cursors.values()): self.resync(status['instance'])
+        for record in self.pages('/devices', activities=self.activities):
+            self.engine.apply(record)
+            self.emit("device", record['ip'])
+        for item in self.pages('/locations'):
+            ip, loc = item['ip'], (item['lat'], item['lon'], item['city'])
+            if self.locations.get(ip) == loc: # Replayed by a resync or reset: the map already has it
+                self.locations.move_to_end(ip)
+                continue
+            self.locations[ip] = loc
+            if self.max_locations and len(self.locations) > self.max_locations: self.locations.popitem(last=False)
+            self.emit("location", ip, *loc)
+        for event in self.pages('/events'):
+            kind = event['kind']
+            if kind == "log": self.emit("log", event['message'], event['ip'], event['host_ip'])
+            elif kind == "hostname": self.emit("hostname", event['ip'], event['name'])
+            elif kind == "flows": self.emit("flows", event['records'])
+        self.capturing = status['capturing']
+        if status.get('capture_ready', True): self.capture_ready.set()
+
+    def _poll(self):
+        while True:
+            self.counters['polls'] += 1
+            try:
+                self.sync()
+                if not self.connected: self.emit("log", f"ATTACHED: {self.url}", None, None)
+                self.connected = True
+            except Exception as e:
+                self.counters['errors'] += 1
+                if self.connected is not False: self.emit("log", f"ERROR: daemon {self.url} unreachable ({e})", None, None)
+                self.connected = False
+            if self.closing.wait(self.interval): return
+
+    def _post(self, path):
+        try: self.capturing = self.request(path, method="POST")['capturing']
+        except Exception as e: self.emit("log", f"ERROR: {path} failed ({e})", None, None)
+
+    def start_capture(self):
+        threading.Thread(target=self._post, args=("/capture/start",), daemon=True).start()
+
+    def stop_capture(self):
+        threading.Thread(target=self._post, args=("/capture/stop",), daemon=True).start()
+
+    def close(self):
+        self.closing.set()
+
+    def stats(self):
+        return dict(self.counters, devices=len(self.engine.devices), locations=len(self.locations),
+                    connected=int(bool(self.connected)), **{f"cursor{path.replace('/', '_')}": c for path, c in self.cursors.items()})
@@ -0,0 +1,43 @@
+import argparse
+import json
+import sys
+
+from engine import AnalysisEngine, replay_capture
+from metrics import MetricsRegistry, MetricsExporter
+from export import EventExporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run NETSCAN analysis over a pcap/pcapng file (no UI, no admin rights)")
+    parser.add_argument("capture", help="pcap or pcapng file")
+    parser.add_argument("--realtime", action="store_true", help="replay at the original packet timing")
+    parser.add_argument("--speed", type=float, default=1.0, help="timing multiplier for --realtime")
+    parser.add_argument("--log", action="store_true", help="print console lines as they are produced")
+    parser.add_argument("--json", action="store_true", help="print the final device inventory as JSON")
+    parser.add_argument("--export", metavar="DIR", help="write structured events (JSONL, gzipped on rotation) to DIR")
+    parser.add_argument("--metrics", metavar="PATH", help="write per-branch latency and counters (.json, else Prometheus text)")
+    args = parser.parse_args()
+
+    listener = None
+    if args.log:
+        listener = lambda kind, *ev: print(ev[0]) if kind == "log" else None
+    metrics = MetricsRegistry(enabled=bool(args.metrics))
+    exporter = EventExporter(args.export).start() if args.export else None
+    engine = AnalysisEngine(listener=listener, packet_time=True, metrics=metrics, exporter=exporter)
+    frames, elapsed = replay_capture(engine, args.capture, realtime=args.realtime, speed=args.speed)
+    if exporter: exporter.close()
+
+    if args.json:
+        print(json.dumps({ip: dict(dev.to_dict(), risk=engine.device_risk(ip)) for ip, dev in engine.devices.items()}, indent=2))
+    else:
+        for ip, dev in sorted(engine.devices.items(), key=lambda item: -engine.device_risk(item[0])):
+            print(f"{ip:<16} risk {round(engine.device_risk(ip) * 100):>3}%  {dev.name or '-'}  ({len(dev.activities)} activities)")
+    rate = frames / elapsed if elapsed else 0.0
+    print(f"# {frames} frames in {elapsed:.2f}s ({rate:,.0f} pkts/sec) | {engine.stats()}",
+          file=sys.stderr if args.json else sys.stdout)
+    if args.metrics:
+        MetricsExporter(metrics, args.metrics, "json" if args.metrics.endswith(".json") else "prometheus").write()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lookup_cache import MISS
+
+
+class HostnameResolver:
+    # Reverse DNS off the capture thread. lookup() never blocks: it returns the
+    # cached name (or None) and, on a miss, schedules one PTR query per IP no
+    # matter how many callers ask for it while it is in flight.
+    def __init__(self, cache, workers=4, resolve=None, latency=None):
+        self.cache = cache
+        self.resolve = resolve or (lambda ip: socket.gethostbyaddr(ip)[0])
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rdns")
+        self.pending = {}     # IP -> [callback(name), ...]
+        self.lock = threading.Lock()
+        self.counters = {'queries': 0, 'coalesced': 0, 'resolved': 0, 'failed': 0}
+        self.latency = latency # optional metrics Histogram of PTR query time
+
+    def lookup(self, ip, callback=None):
+        name = self.cache.get(ip)
+        if name is not MISS: return name
+        with self.lock:
+            if ip in self.pending:
+                self.counters['coalesced'] += 1
+                if callback: self.pending[ip].append(callback)
+                return None
+            self.pending[ip] = [callback] if callback else []
+            self.counters['queries'] += 1
+        try:
+            self.executor.submit(self._resolve, ip)
+        except RuntimeError: # executor shut down
+            with self.lock: self.pending.pop(ip, None)
+        return None
+
+    def _resolve(self, ip):
+        start = time.perf_counter()
+        try: name = self.resolve(ip)
+        except Exception: name = None
+        if self.latency: self.latency.observe(time.perf_counter() - start)
+        try: self.cache.put(ip, name) # Failed PTR lookups are cached as negatives
+        except Exception: pass
+        with self.lock:
+            callbacks = self.pending.pop(ip, [])
+            self.counters['resolved' if name else 'failed'] += 1
+        if not name: return
+        for callback in callbacks:
+            try: callback(name)
+            except Exception: pass
+
+    def stop(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, in_flight=len(self.pending))
@@ -0,0 +1,113 @@
+import heapq
+import math
+import time
+
+
+class RiskIndex:
+    # Per-device risk as an exponentially decayed score. Each scored activity
+    # adds its weight (capped at 1.0) and the score halves every half_life
+    # seconds. Nothing is swept: a score is stored with the time it was last
+    # changed and decayed when it is read. Every score decays at the same
+    # rate, so their order only changes on updates; the global maximum is the
+    # top of a heap keyed on ln(score) + t / tau, which stays constant while a
+    # device is idle (stale heap entries are dropped when they surface).
+    # half_life=None disables decay. clock() is "now" for reads without one.
+    def __init__(self, half_life=1800.0, clock=time.time):
+        self.half_life = half_life
+        self.tau = half_life / math.log(2) if half_life else None
+        self.clock = clock
+        self.scores = {} # ip -> (score, at, seq)
+        self.heap = []   # (-key, seq, ip)
+        self.origin = None
+        self.seq = 0
+
+    def decayed(self, score, at, now):
+        if not self.tau or now <= at: return score
+        return score * math.exp((at - now) / self.tau)
+
+    def set(self, ip, score, now=None):
+        now = self.clock() if now is None else now
+        if self.origin is None: self.origin = now
+        self.seq += 1
+        self.scores[ip] = (score, now, self.seq)
+        if score > 0:
+            key = math.log(score) + ((now - self.origin) / self.tau if self.tau else 0.0)
+            heapq.heappush(self.heap, (-key, self.seq, ip))
+            if len(self.heap) > 2 * len(self.scores) + 64: self._compact()
+
+    def add(self, ip, weight, now=None):
+        # Returns how much the risk went up
+        now = self.clock() if now is None else now
+        entry = self.scores.get(ip)
+        before = self.decayed(entry[0], entry[1], now) if entry else 0.0
+        if before >= 1.0 and entry[1] == now: return 0.0 # Capped and not decayed: nothing to store
+        self.set(ip, min(1.0, before + weight), now)
+        return min(1.0, before + weight) - before
+
+    def risk(self, ip, now=None):
+        entry = self.scores.get(ip)
+        if entry is None: return 0.0
+        return self.decayed(entry[0], entry[1], self.clock() if now is None else now)
+
+    def remove(self, ip):
+        self.scores.pop(ip, None)
+
+    def _compact(self):
+        self.heap = [item for item in self.heap if self.scores.get(item[2], (0, 0, None))[2] == item[1]]
+        heapq.heapify(self.heap)
+
+    def max(self, now=None):
+        heap = self.heap
+        while heap:
+            _, seq, ip = heap[0]
+            entry = self.scores.get(ip)
+            if entry is None or entry[2] != seq:
+                heapq.heappop(heap) # superseded by a later update
+                continue
+            return self.decayed(entry[0], entry[1], self.clock() if now is None else now)
+        return 0.0
+
+    def __len__(self):
+        return len(self.scores)
+
+    def stats(self):
+        return {'devices': len(self.scores), 'max_risk': self.max(), 'heap': len(self.heap)}
+
+
+class SlidingWindow:
+    # Event count over the last `window` seconds in `buckets` fixed slots.
+    # Slots are only rotated when the window is touched or read, so an idle
+    # window costs nothing; counts are exact to one slot width.
+    __slots__ = ('width', 'counts', 'head', 'total')
+
+    def __init__(self, window=60.0, buckets=12):
+        self.width = window / buckets
+        self.counts = [0] * buckets
+        self.head = None # absolute number of the newest slot
+        self.total = 0
+
+    def _advance(self, now):
+        slot = int(now // self.width)
+        if slot == self.head: return
+        if self.head is None or slot - self.head >= len(self.counts):
+            if self.total: self.counts = [0] * len(self.counts)
+            self.total = 0
+        elif slot > self.head:
+            counts, n = self.counts, len(self.counts)
+            for i in range(self.head + 1, slot + 1):
+                self.total -= counts[i % n]
+                counts[i % n] = 0
+        else: return # Same slot, or a late timestamp: counted in the newest slot
+        self.head = slot
+
+    def add(self, now, count=1):
+        self._advance(now)
+        self.counts[self.head % len(self.counts)] += count
+        self.total += count
+
+    def count(self, now):
+        self._advance(now)
+        return self.total
+
+    def per_minute(self, now):
+        return self.count(now) * 60.0 / (self.width * len(self.counts))
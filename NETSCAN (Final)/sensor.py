@@ -0,0 +1,194 @@
+import os
+import threading
+import time
+
+from geolocation import GeoLocator, RangeDatabase, IpApiProvider, LocationChain, LookupDeferred
+from lookup_cache import CacheDatabase, LookupCache, MISS
+from resolver import HostnameResolver
+from capture import PacketRing, capture_frames, analyze_frames, open_capture_socket
+from detectors import build_filter, capture_snaplen
+from shards import ShardedCapture
+from metrics import MetricsRegistry, MetricsExporter
+from export import EventExporter
+from engine import AnalysisEngine
+from domains import DomainIndex
+from session import SessionStore
+
+
+class Sensor:
+    # Everything but the UI: lookup caches, geolocation, reverse DNS, the
+    # analysis engine and the capture pipeline, built from a SETTINGS dict.
+    # Owned by the window (app.py) or by the headless service (daemon.py).
+    # listener(kind, *args) gets the engine events (see AnalysisEngine) plus
+    #   ("location", ip, lat, lon, city)   geolocation answer for an external destination
+    # It is called on worker threads and must not block.
+    def __init__(self, settings, listener=None, metrics=None):
+        self.settings = settings
+        self.listener = listener or (lambda kind, *args: None)
+        self.running = True
+        self.capturing = False
+        self.closing = threading.Event()
+
+        # Scapy takes most of a second to import: it loads on its own thread while the rest is built,
+        # and capture_ready is set once a capture can start (the capture thread waits for it)
+        self.conf = None
+        self.capture_ready = threading.Event()
+        self.timings = {}
+        threading.Thread(target=self.load_capture, name="scapy-import", daemon=True).start()
+
+        # Performance metrics (collectors read each component's stats() only when a snapshot is taken)
+        self.metrics = metrics or MetricsRegistry(enabled=settings["metrics"]["enabled"])
+        self.geo_latency = self.metrics.histogram("geo_lookup")
+
+        # Persistent lookup caches (warm-loaded from disk, shared by geo + reverse DNS)
+        self.lookup_db = CacheDatabase(settings["lookup_cache_db"] or ":memory:")
+        self.geo_cache = LookupCache(self.lookup_db, "geo", **settings["geo_cache"])
+        self.ip_to_hostname = LookupCache(self.lookup_db, "dns", **settings["dns_cache"])
+        self.resolver = HostnameResolver(self.ip_to_hostname, # Reverse DNS off the sniffer thread
+                                         latency=self.metrics.histogram("dns_lookup") if self.metrics.enabled else None)
+
+        # Geolocation worker pool (dedup happens before enqueue)
+        providers = []
+        if os.path.exists(settings["geo_range_db"]): providers.append(RangeDatabase(settings["geo_range_db"]))
+        if settings["geo_online_fallback"]: providers.append(IpApiProvider())
+        self.geo_providers = LocationChain(providers, on_error=lambda provider, e: self.emit(
+            "log", f"ERROR: geolocation via {type(provider).__name__} failed ({e}), trying the next source", None, None))
+        self.geolocator = GeoLocator(self.geolocate_ip, on_result=lambda ip, loc: self.emit("location", ip, *loc),
+                                     workers=2, resolve_many=self.geolocate_batch,
+                                     batch_size=settings["geo_batch_size"], batch_window=settings["geo_batch_window"],
+                                     max_known=settings["geo_cache"]["max_entries"])
+        self.locations = self.geolocator.locations # IP -> (lat, lon, city)
+        self.geolocator.start()
+
+        # Optional structured event export (background writer, never blocks analysis)
+        self.event_exporter = None
+        if settings["event_export"]["enabled"]:
+            cfg = settings["event_export"]
+            self.event_exporter = EventExporter(cfg["directory"], max_bytes=cfg["max_mb"] * 2 ** 20,
+                                                max_age=cfg["max_age"], compress=cfg["compress"]).start()
+            self.metrics.collect("export", self.event_exporter.stats)
+
+        self.engine = AnalysisEngine(listener=self.listener, geolocator=self.geolocator, resolver=self.resolver,
+                                     max_activities=settings["device_max_activities"], detectors=settings["detectors"],
+                                     flows=settings["flows"], metrics=self.metrics, exporter=self.event_exporter,
+                                     domains=DomainIndex.load(**settings["domain_intel"]), risk=settings["risk"])
+
+        # Session snapshot: the previous inventory and map are restored in the background, then saved periodically
+        self.session = None
+        if settings["session"]["path"]:
+            self.session = SessionStore(settings["session"]["path"], self.engine, self.geolocator, self.emit,
+                                        settings["session"]["interval"]).start(resume=settings["session"]["resume"])
+            self.metrics.collect("session", self.session.stats)
+
+        # Capture -> ring buffer -> analysis workers (dissection stays off the capture thread)
+        # Capture only what the enabled detectors need: kernel-side BPF, and frames cut to snaplen as they enter the ring
+        self.capture_filter = build_filter(settings["detectors"])
+        self.capture_ring = dict(settings["capture_ring"], snaplen=capture_snaplen(settings["detectors"], settings["capture_ring"]["snaplen"]))
+        self.packet_ring = PacketRing(**self.capture_ring)
+        self.capture_generation = 0
+        self.sharded_capture = None # Multi-interface / multi-process capture, when configured
+        self.metrics.collect("capture", lambda: self.sharded_capture.stats() if self.sharded_capture else self.packet_ring.stats())
+        self.metrics.collect("geo", self.geolocator.stats)
+        self.metrics.collect("geo_cache", self.geo_cache.stats)
+        self.metrics.collect("dns", self.resolver.stats)
+        self.metrics.collect("dns_cache", self.ip_to_hostname.stats)
+        self.metrics.collect("domains", self.engine.domains.stats)
+        self.metrics.collect("startup", lambda: dict(self.timings, capture_ready=int(self.capture_ready.is_set())))
+        self.metrics_exporter = None
+        if settings["metrics"]["enabled"] and settings["metrics"]["export_path"]:
+            self.metrics_exporter = MetricsExporter(self.metrics, settings["metrics"]["export_path"],
+                                                    settings["metrics"]["export_format"], settings["metrics"]["export_interval"]).start()
+        for i in range(settings["analysis_workers"]):
+            threading.Thread(target=analyze_frames, args=(self.packet_ring, self.analyze_frame, lambda: self.running),
+                             name=f"analysis-{i}", daemon=True).start()
+        threading.Thread(target=self.expire_flows, name="flow-expiry", daemon=True).start()
+
+    def load_capture(self):
+        start = time.perf_counter()
+        try:
+            from scapy.all import conf
+            self.conf = conf
+        except Exception as e:
+            self.emit("log", f"ERROR: Scapy unavailable ({e})", None, None)
+        finally:
+            self.timings['scapy_import'] = round(time.perf_counter() - start, 3)
+            self.capture_ready.set()
+
+    def emit(self, kind, *args):
+        try: self.listener(kind, *args)
+        except Exception: pass
+
+    def geolocate_ip(self, ip):
+        return self.geolocate_batch([ip]).get(ip)
+
+    def geolocate_batch(self, ips):
+        # Runs on a GeoLocator worker: cache, then offline table, then ip-api if enabled
+        results, misses = {}, []
+        for ip in ips:
+            cached = self.geo_cache.get(ip)
+            if cached is MISS: misses.append(ip)
+            elif cached: results[ip] = tuple(cached)
+        if misses:
+            start = time.perf_counter()
+            deferred = None
+            try: found = self.geo_providers.lookup_many(misses)
+            except LookupDeferred as e: found, deferred = e.results, e
+            self.geo_latency.observe(time.perf_counter() - start)
+            for ip in misses:
+                if deferred is None or ip in found:
+                    self.geo_cache.put(ip, found.get(ip)) # None is cached as a negative result
+            results.update(found)
+            if deferred: raise LookupDeferred(str(deferred), results, deferred.retry_after)
+        return results
+
+    def expire_flows(self):
+        # Once a second: export flows past their idle/active timeout
+        while not self.closing.wait(1.0):
+            self.engine.expire_flows()
+
+    def analyze_frame(self, data, ts, kind):
+        # Runs on an analysis worker: parse the raw frame (Scapy only for unusual ones), then apply the detectors
+        if self.capturing: self.engine.process_raw(data, ts, kind)
+
+    def start_capture(self):
+        self.capturing = True
+        if self.settings["capture_interfaces"] or self.settings["capture_shards"] > 1:
+            if self.sharded_capture: return
+            self.sharded_capture = ShardedCapture(self.engine, self.settings["capture_interfaces"], self.settings["capture_shards"],
+                                                  self.capture_filter, self.capture_ring, self.settings["dns_cache"],
+                                                  detectors=self.settings["detectors"], flows=self.settings["flows"],
+                                                  domains=self.settings["domain_intel"]).start()
+            return
+        # Retire any previous capture loop; the ring's producer lock hands over to the new one
+        self.capture_generation += 1
+        threading.Thread(target=self.start_sniffing, args=(self.capture_generation,), name="capture", daemon=True).start()
+
+    def start_sniffing(self, generation):
+        keep_running = lambda: self.capturing and self.running and self.capture_generation == generation
+        self.capture_ready.wait()
+        if self.conf is None or not keep_running(): return
+        try:
+            sock, _ = open_capture_socket(self.conf, self.capture_filter, lambda message: self.emit("log", message, None, None))
+            try: capture_frames(sock, self.packet_ring, keep_running)
+            finally: sock.close()
+        except Exception as e:
+            if self.running: self.emit("log", f"ERROR: {str(e)}", None, None)
+
+    def stop_capture(self):
+        self.capturing = False
+        if self.sharded_capture:
+            self.sharded_capture.stop()
+            self.sharded_capture = None
+
+    def close(self):
+        self.running = False
+        self.closing.set()
+        self.stop_capture()
+        if self.metrics_exporter: self.metrics_exporter.stop()
+        if self.event_exporter:
+            self.engine.expire_flows(everything=True)
+            self.event_exporter.close()
+        if self.session: self.session.stop()
+        self.geolocator.stop()
+        self.resolver.stop()
+        self.lookup_db.close()
@@ -0,0 +1,162 @@
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = b"NETSCAN-SESSION"
+FORMAT_VERSION = 2 # 1 was marshal records, which are tied to the Python version
+LOCATION_CHUNK = 1024
+
+_header = struct.Struct("!B")
+_length = struct.Struct("!I")
+
+
+def read_records(path, block=65536):
+    # Streams the snapshot's records one at a time (no full read or decompress up front)
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC: raise ValueError("not a NETSCAN session snapshot")
+        header = f.read(_header.size)
+        version = _header.unpack(header)[0] if len(header) == _header.size else None
+        if version != FORMAT_VERSION: raise ValueError(f"unsupported session format {version}")
+        inflate = zlib.decompressobj()
+        buf = b""
+        while True:
+            data = f.read(block)
+            buf += inflate.decompress(data) if data else inflate.flush()
+            off = 0
+            while len(buf) - off >= 4:
+                size = _length.unpack_from(buf, off)[0]
+                if len(buf) - off < 4 + size: break
+                yield json.loads(buf[off + 4:off + 4 + size])
+                off += 4 + size
+            buf = buf[off:]
+            if not data: break
+        if buf: raise ValueError("truncated session snapshot")
+
+
+class SessionStore:
+    # Periodic snapshot of the device inventory (activities, names, risk
+    # scores) and geolocated destinations to one compact binary file: a
+    # versioned header, then a zlib stream of length-prefixed JSON records
+    # (times in integer milliseconds), replaced atomically. Only
+    # devices whose version changed are re-encoded; unchanged ones and full
+    # chunks of locations reuse their bytes from the previous snapshot.
+    # load() replays the file in the background through the engine so the
+    # caller's UI is up at once and fills in as records arrive. Nothing is
+    # written until the load has finished, so a slow resume cannot truncate
+    # the previous session, and a file that cannot be loaded is moved aside
+    # rather than overwritten.
+    def __init__(self, path, engine, geolocator, emit, interval=30.0):
+        self.path = path
+        self.engine = engine
+        self.geolocator = geolocator
+        self.emit = emit
+        self.interval = interval
+        self.encoded = {}   # ip -> (device version, record bytes)
+        self.location_chunks = {} # n -> encoded locations [n * LOCATION_CHUNK, (n + 1) * LOCATION_CHUNK) by insertion index
+        self.written = None # (devices, locations evicted, locations) in the last snapshot
+        self.stop_event = threading.Event()
+        self.write_lock = threading.Lock()
+        self.loaded = threading.Event()
+        self.counters = {'writes': 0, 'bytes': 0, 'encoded': 0, 'restored_devices': 0, 'restored_locations': 0,
+                         'load_seconds': 0.0, 'write_seconds': 0.0}
+
+    def start(self, resume=True):
+        threading.Thread(target=self._run, args=(resume,), name="session", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.loaded.is_set(): self.write() # Final snapshot on shutdown
+
+    def _run(self, resume):
+        if resume and os.path.exists(self.path):
+            try: self.load()
+            except Exception as e:
+                kept = f"{self.path}.{int(time.time())}.unreadable"
+                try: os.replace(self.path, kept)
+                except OSError: kept = self.path
+                self.emit("log", f"ERROR: session snapshot not restored ({e}), kept as {kept}", None, None)
+        self.loaded.set()
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def load(self):
+        start = time.perf_counter()
+        for record in read_records(self.path):
+            if self.stop_event.is_set(): return
+            kind = record[0]
+            if kind == "D":
+                _, ip, name, dropped, score, at, activities = record
+                self.engine.restore_device(ip, name, dropped, score, at / 1000.0,
+                                           [(a, first / 1000.0, last / 1000.0, hits, scored / 1000.0)
+                                            for a, first, last, hits, scored in activities])
+                self.counters['restored_devices'] += 1
+            elif kind == "L":
+                for ip, lat, lon, city in record[1]:
+                    self.geolocator.preload(ip, (lat, lon, city))
+                    self.emit("location", ip, lat, lon, city)
+                self.counters['restored_locations'] += len(record[1])
+            time.sleep(0) # Let capture and the UI run between records
+        self.counters['load_seconds'] = round(time.perf_counter() - start, 3)
+
+    def _encode(self, record):
+        data = json.dumps(record, separators=(",", ":")).encode()
+        return _length.pack(len(data)) + data
+
+    def write(self):
+        with self.write_lock:
+            start = time.perf_counter()
+            engine = self.engine
+            parts = []
+            encoded = self.counters['encoded']
+            for ip, dev in list(engine.devices.items()):
+                cached = self.encoded.get(ip)
+                if cached and cached[0] == dev.version:
+                    parts.append(cached[1])
+                    continue
+                with engine.lock: # One device at a time: analysis is never held up for the whole inventory
+                    version = dev.version
+                    score, at = engine.risk.scores.get(ip, (0.0, 0.0, 0))[:2]
+                    record = ("D", ip, dev.name, dev.dropped, score, int(at * 1000),
+                              [(a, int(r.first_seen * 1000), int(r.last_seen * 1000), r.hits, int(r.scored * 1000))
+                               for a, r in dev.activities.items()])
+                data = self._encode(record)
+                self.encoded[ip] = (version, data)
+                self.counters['encoded'] += 1
+                parts.append(data)
+
+            with self.geolocator.lock:
+                locations = list(self.geolocator.locations.items())
+                first = self.geolocator.evicted # insertion index of locations[0]
+            size = (len(parts), first, len(locations))
+            if encoded == self.counters['encoded'] and size == self.written: return # Nothing changed
+            # Chunks sit at fixed insertion indexes, so dropping the oldest locations keeps later chunks reusable
+            end = first + len(locations)
+            lo, hi = -(-first // LOCATION_CHUNK), end // LOCATION_CHUNK # full chunks
+            for n in [n for n in self.location_chunks if n < lo]: del self.location_chunks[n]
+            head = locations[:min(lo * LOCATION_CHUNK, end) - first]
+            if head: parts.append(self._encode(("L", [(ip, *loc) for ip, loc in head])))
+            for n in range(lo, hi):
+                if n not in self.location_chunks:
+                    chunk = locations[n * LOCATION_CHUNK - first:(n + 1) * LOCATION_CHUNK - first]
+                    self.location_chunks[n] = self._encode(("L", [(ip, *loc) for ip, loc in chunk]))
+                parts.append(self.location_chunks[n])
+            tail = locations[max(hi * LOCATION_CHUNK, first + len(head)) - first:]
+            if tail: parts.append(self._encode(("L", [(ip, *loc) for ip, loc in tail])))
+
+            body = MAGIC + _header.pack(FORMAT_VERSION) + zlib.compress(b"".join(parts), 1)
+            tmp = f"{self.path}.tmp"
+            try:
+                with open(tmp, "wb") as f: f.write(body)
+                os.replace(tmp, self.path)
+            except OSError: return
+            self.written = size
+            self.counters['writes'] += 1
+            self.counters['bytes'] = len(body)
+            self.counters['write_seconds'] = round(time.perf_counter() - start, 3)
+
+    def stats(self):
+        return dict(self.counters, loading=int(not self.loaded.is_set()), cached=len(self.encoded))
@@ -0,0 +1,43 @@
+import os
+
+from domains import DEFAULT_PSL, DEFAULT_CATEGORY_DIR
+
+SETTINGS = {
+    "geo_range_db": os.path.join(os.path.dirname(os.path.abspath(__file__)), "ip_ranges.csv"), # Optional offline table
+    "geo_online_fallback": True,   # Ask ip-api.com when the offline table has no answer
+    "geo_batch_size": 100,         # ip-api /batch accepts at most 100 IPs per request
+    "geo_batch_window": 0.25,      # Seconds to collect new destinations before a lookup
+    "lookup_cache_db": os.path.join(os.path.dirname(os.path.abspath(__file__)), "netscan_cache.db"), # None = memory only
+    "geo_cache": {"ttl": 7 * 86400, "negative_ttl": 3600, "max_entries": 50000},
+    "dns_cache": {"ttl": 86400, "negative_ttl": 600, "max_entries": 20000},
+    "capture_ring": {"capacity": 4096, "snaplen": 2048}, # Frames buffered between capture and analysis (snaplen = upper bound)
+    "detectors": ["dns", "http", "discovery", "map"], # Analyses to run; the kernel filter only admits their traffic
+    "flows": {"idle_timeout": 15, "active_timeout": 60, "sample_rate": 1, "max_flows": 65536}, # Map traffic accounting
+    # Device risk decays by half every half_life seconds (None = never); event rates over rate_window seconds
+    "risk": {"half_life": 1800, "rate_window": 60, "rate_buckets": 12},
+    "analysis_workers": 1,
+    "capture_interfaces": [],      # Interfaces to capture on at once; empty = the default interface
+    "capture_shards": 1,           # Processes per interface (split by source IP); 1 = in-process capture
+    "ui_tick_ms": 100,             # Render tick: pending log lines/device updates are applied as one batch
+    "ui_max_events_per_tick": 5000,
+    "ui_max_backlog": 50000,       # Log lines arriving while this many events wait are dropped (counted in metrics)
+    "log_capacity": 5000,          # Log lines kept; the oldest are trimmed one at a time
+    "map_flush_ms": 500,           # Marker layer redraw rate (only while the map is visible)
+    "map_cluster_px": 64,          # Cities closer than this on screen share one marker
+    # Self-instrumentation; export_path writes a periodic dump ("prometheus" text or "json"), None = panel only
+    "metrics": {"enabled": True, "export_path": None, "export_format": "prometheus", "export_interval": 10},
+    # Domain intelligence: public suffix list + category lists (missing files fall back to built-ins)
+    "domain_intel": {"public_suffix_list": DEFAULT_PSL, "category_dir": DEFAULT_CATEGORY_DIR, "cache_size": 65536,
+                     "weights": {"tracker": 0.03, "ad": 0.02, "telemetry": 0.03, "vendor": 0.005}},
+    # Structured JSONL event log (activities + flows), rotated by size/age; rotated files are gzipped
+    "event_export": {"enabled": False, "directory": os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports"),
+                     "max_mb": 64, "max_age": 3600, "compress": True},
+    "device_max_activities": 500,  # Per-device activity history; the oldest are dropped beyond this
+    "detail_max_activities": 200,  # Newest activities drawn in the device detail view
+    # Device inventory + geolocations snapshotted every `interval` s and restored at startup (path None = off)
+    "session": {"path": os.path.join(os.path.dirname(os.path.abspath(__file__)), "netscan_session.bin"),
+                "interval": 30, "resume": True},
+    # Headless daemon (daemon.py) query API: "host:port" or "unix:/path"; events kept for since-cursor polling
+    "api": {"listen": "127.0.0.1:8765", "max_events": 10000, "page_size": 500},
+    "attach": None                 # URL of a running daemon (e.g. "http://127.0.0.1:8765"): the UI mirrors it instead of capturing
+}
@@ -0,0 +1,162 @@
+import multiprocessing
+import queue
+import threading
+import time
+
+from capture import PacketRing, capture_frames, analyze_frames, open_capture_socket, shard_filter
+from engine import AnalysisEngine
+
+
+class DeltaEngine(AnalysisEngine):
+    # Shard-side engine: runs the detectors and dedup for its slice of source
+    # IPs but keeps no inventory. Every state change leaves as a compact tuple
+    # that the parent replays on its own engine, so the UI process holds the one
+    # consistent copy of each device.
+    def __init__(self, send, resolver=None, detectors=None, flows=None, domains=None):
+        super().__init__(listener=lambda kind, *args: send((kind,) + args) if kind in ("log", "flows") else None,
+                         resolver=resolver, detectors=detectors, flows=flows, domains=domains)
+        self.send = send
+
+    def locate(self, dst):
+        self.send(("locate", dst))
+
+    def update_devices(self, ip, activity, risk_weight=0.0, potential_name=None, now=None, dst=None, protocol=None, category=None):
+        self.send(("update", ip, activity, risk_weight, potential_name, time.time() if now is None else now, dst, protocol, category))
+
+    def apply_hostname(self, dst, name, src, old_activity, new_activity):
+        self.send(("hostname", dst, name, src, old_activity, new_activity))
+
+
+def run_shard(spec, out, stop):
+    # Process entry point (module level so it can be spawned on Windows/macOS)
+    from scapy.all import conf
+    from lookup_cache import CacheDatabase, LookupCache
+    from resolver import HostnameResolver
+    from domains import DomainIndex
+
+    label = spec['label']
+    pending = []
+    lock = threading.Lock()
+
+    def send(delta):
+        with lock: pending.append(delta)
+
+    def flush():
+        with lock:
+            if not pending: return
+            batch = pending[:]
+            del pending[:]
+        out.put((label, batch))
+
+    def warn(message):
+        if spec['shard'] == 0: send(("log", f"{message} [{label}]", None, None))
+
+    resolver = HostnameResolver(LookupCache(CacheDatabase(":memory:"), "dns", **spec['dns_cache']), workers=2)
+    engine = DeltaEngine(send, resolver, spec['detectors'], spec['flows'], DomainIndex.load(**(spec['domains'] or {})))
+    ring = PacketRing(**spec['ring'])
+    keep_running = lambda: not stop.is_set()
+    threading.Thread(target=analyze_frames, args=(ring, engine.process_raw, keep_running), daemon=True).start()
+    try:
+        kwargs = {'iface': spec['iface']} if spec['iface'] else {}
+        sock, filtered = open_capture_socket(conf, shard_filter(spec['filter'], spec['shard'], spec['shards']), warn, **kwargs)
+        if not filtered and spec['shard']: # No kernel-side split without a filter: shard 0 captures the whole interface
+            sock.close()
+            resolver.stop()
+            return
+        capture = threading.Thread(target=capture_frames, args=(sock, ring, keep_running), daemon=True)
+        capture.start()
+        last_stats = 0.0
+        while keep_running() and capture.is_alive():
+            stop.wait(spec['flush_interval'])
+            if time.monotonic() - last_stats >= 1.0:
+                last_stats = time.monotonic()
+                engine.expire_flows()
+                send(("stats", dict(engine.counters, dedup_entries=len(engine.recent), flows=len(engine.flows), **ring.stats())))
+            flush()
+        capture.join(1.0)
+        sock.close()
+        engine.expire_flows(everything=True)
+    except Exception as e:
+        send(("error", str(e)))
+    resolver.stop()
+    flush()
+
+
+class ShardedCapture:
+    # Captures on several interfaces and/or splits each one across `shards`
+    # processes (BPF hash on the source IP). Shards batch their deltas onto one
+    # multiprocessing queue; a drain thread applies them to the parent engine,
+    # which emits the usual events to the UI.
+    def __init__(self, engine, interfaces=None, shards=2, capture_filter=None, ring=None, dns_cache=None,
+                 flush_interval=0.1, detectors=None, flows=None, domains=None):
+        self.engine = engine
+        self.interfaces = list(interfaces or [None]) # None: the default interface
+        self.shards = max(1, shards)
+        self.capture_filter = capture_filter
+        self.ring = ring or {}
+        self.dns_cache = dns_cache or {"ttl": 86400, "negative_ttl": 600, "max_entries": 20000}
+        self.flush_interval = flush_interval
+        self.detectors = detectors
+        self.flows = flows
+        self.domains = domains # DomainIndex.load() options, rebuilt in each shard
+        self.ctx = multiprocessing.get_context("spawn") # never fork a process that owns a Tk interpreter
+        self.queue = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.processes = []
+        self.shard_stats = {} # label -> last stats dict reported by that shard
+        self.deltas = 0
+
+    def start(self):
+        for iface in self.interfaces:
+            for shard in range(self.shards):
+                label = f"{iface or 'default'}#{shard}"
+                spec = {'label': label, 'iface': iface, 'shard': shard, 'shards': self.shards,
+                        'filter': self.capture_filter, 'ring': self.ring, 'dns_cache': self.dns_cache,
+                        'flush_interval': self.flush_interval, 'detectors': self.detectors,
+                        'flows': self.flows, 'domains': self.domains}
+                proc = self.ctx.Process(target=run_shard, args=(spec, self.queue, self.stop_event),
+                                        name=f"shard-{label}", daemon=True)
+                proc.start()
+                self.processes.append(proc)
+        threading.Thread(target=self._drain, name="shard-drain", daemon=True).start()
+        return self
+
+    def _drain(self):
+        while True:
+            try: label, batch = self.queue.get(timeout=0.2)
+            except queue.Empty:
+                if self.stop_event.is_set() and not any(p.is_alive() for p in self.processes): return
+                continue
+            self.deltas += len(batch)
+            for delta in batch:
+                try: self.apply(label, delta)
+                except Exception: pass
+
+    def apply(self, label, delta):
+        kind = delta[0]
+        if kind == "update": self.engine.update_devices(*delta[1:])
+        elif kind == "log": self.engine.emit("log", *delta[1:])
+        elif kind == "locate": self.engine.locate(delta[1])
+        elif kind == "flows": self.engine.export_flows(delta[1])
+        elif kind == "hostname": self.engine.apply_hostname(*delta[1:])
+        elif kind == "stats": self.shard_stats[label] = delta[1]
+        elif kind == "error": self.engine.emit("log", f"ERROR: [{label}] {delta[1]}", None, None)
+
+    def stop(self, timeout=2.0):
+        # Non-blocking for the caller: shards are joined (and killed if stuck) on a helper thread
+        self.stop_event.set()
+        def reap():
+            deadline = time.monotonic() + timeout
+            for proc in self.processes:
+                proc.join(max(0.0, deadline - time.monotonic()))
+                if proc.is_alive(): proc.terminate()
+        threading.Thread(target=reap, name="shard-reaper", daemon=True).start()
+
+    def stats(self):
+        totals = {}
+        for stats in list(self.shard_stats.values()):
+            for key, value in stats.items():
+                if key in ('capacity', 'high_water'): totals[key] = max(totals.get(key, 0), value)
+                else: totals[key] = totals.get(key, 0) + value
+        return dict(totals, shards=len(self.processes), alive=sum(p.is_alive() for p in self.processes),
+                    deltas=self.deltas)
@@ -0,0 +1,135 @@
+import json
+import socket
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from api import ApiServer, ChangeFeed
+from remote import RemoteSensor
+from sensor import Sensor
+from settings import SETTINGS
+
+QUIET = dict(SETTINGS, session=dict(SETTINGS["session"], path=None), lookup_cache_db=None, geo_online_fallback=False)
+
+
+class Daemon:
+    # A Sensor (never capturing) behind the query API, as daemon.py runs it
+    def __init__(self, listen="127.0.0.1:0", max_events=100, page_size=500):
+        self.feed = ChangeFeed(max_events=max_events)
+        self.sensor = Sensor(QUIET, listener=self.feed)
+        self.api = ApiServer(self.sensor, self.feed, listen, page_size).start()
+        self.url = self.api.address()
+
+    def device(self, ip, activity, now=1000.0):
+        self.sensor.engine.update_devices(ip, activity, 0.1, now=now)
+
+    def location(self, ip, lat, lon, city):
+        self.sensor.locations[ip] = (lat, lon, city)
+        self.sensor.emit("location", ip, lat, lon, city)
+
+    def get(self, path):
+        with urllib.request.urlopen(self.url + path) as resp: return json.loads(resp.read())
+
+    def close(self):
+        self.api.stop()
+        self.sensor.close()
+
+
+@pytest.fixture
+def daemon():
+    daemon = Daemon(page_size=3)
+    yield daemon
+    daemon.close()
+
+
+def attach(url, events):
+    # RemoteSensor that has finished its first poll; later syncs are driven by the test
+    remote = RemoteSensor(url, listener=lambda kind, *args: events.append((kind,) + args), interval=60, page_size=2)
+    deadline = time.monotonic() + 5
+    while not remote.connected and time.monotonic() < deadline: time.sleep(0.02)
+    assert remote.connected
+    return remote
+
+
+def test_devices_page_by_since_and_limit(daemon):
+    for i in range(7): daemon.device(f"192.168.1.{i}", f"Browsing a{i}.example.com")
+    seen, cursor = [], 0
+    while True:
+        page = daemon.get(f"/devices?since={cursor}&limit=2")
+        assert len(page['items']) <= 2
+        seen += [item['ip'] for item in page['items']]
+        cursor = page['cursor']
+        if not page['more']: break
+    assert seen == [f"192.168.1.{i}" for i in range(7)]
+    assert daemon.get(f"/devices?since={cursor}")['items'] == []
+    assert len(daemon.get("/devices?since=0&limit=50")['items']) == 3 # capped at the server's page size
+    daemon.device("192.168.1.2", "Browsing b.example.com")
+    page = daemon.get(f"/devices?since={cursor}&activities=1")
+    assert [(item['ip'], item['activities'][0]['activity']) for item in page['items']] == [("192.168.1.2", "Browsing b.example.com")]
+    with pytest.raises(urllib.error.HTTPError):
+        daemon.get("/devices?since=-1")
+
+
+def test_events_report_a_reset_once_the_cursor_fell_off_the_ring():
+    daemon = Daemon(max_events=5)
+    try:
+        for i in range(8): daemon.sensor.emit("log", f"line {i}", None, None)
+        page = daemon.get("/events?since=1")
+        assert page['reset'] and [item['message'] for item in page['items']] == [f"line {i}" for i in range(3, 8)]
+        assert not daemon.get("/events?since=3")['reset']
+        assert daemon.get(f"/events?since={page['cursor']}")['items'] == []
+    finally:
+        daemon.close()
+
+
+def test_remote_reset_does_not_replay_known_locations():
+    daemon = Daemon(max_events=2)
+    events = []
+    try:
+        daemon.device("192.168.1.5", "Browsing example.com")
+        daemon.location("8.8.8.8", 37.4, -122.1, "Mountain View")
+        daemon.sensor.emit("log", "attached", None, None)
+        remote = attach(daemon.url, events)
+        for i in range(5): daemon.sensor.emit("log", f"line {i}", None, None) # pushes the remote's cursor off the ring
+        daemon.location("1.1.1.1", -33.9, 151.2, "Sydney")
+        remote.sync()
+        assert remote.counters['resets'] == 1
+        assert [e[1] for e in events if e[0] == "location"] == ["8.8.8.8", "1.1.1.1"]
+        daemon.location("8.8.8.8", 37.4, -122.0, "Palo Alto") # a changed answer is still passed on
+        remote.sync() # refetches every location after the reset
+        assert [e[1:] for e in events if e[0] == "location"][2:] == [("8.8.8.8", 37.4, -122.0, "Palo Alto")]
+        remote.close()
+    finally:
+        daemon.close()
+
+
+def test_remote_resyncs_when_the_daemon_restarts():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    listen = "127.0.0.1:%d" % sock.getsockname()[1]
+    sock.close()
+    daemon = Daemon(listen)
+    daemon.device("192.168.1.5", "Browsing example.com")
+    for i in range(20): daemon.sensor.emit("log", f"line {i}", None, None)
+    daemon.location("8.8.8.8", 37.4, -122.1, "Mountain View")
+    events = []
+    remote = attach(daemon.url, events)
+    before = remote.cursors['/events']
+    daemon.close()
+
+    daemon = Daemon(listen) # new instance, seq back at 0
+    try:
+        daemon.device("10.0.0.7", "Browsing example.org")
+        daemon.location("8.8.8.8", 37.4, -122.1, "Mountain View")
+        daemon.sensor.emit("log", "after restart", None, None)
+        remote.sync()
+        assert remote.instance == daemon.feed.instance and remote.counters['restarts'] == 1
+        assert "10.0.0.7" in remote.engine.devices
+        assert remote.cursors['/events'] < before
+        assert ("log", "after restart", None, None) in events
+        assert [e[1] for e in events if e[0] == "location"] == ["8.8.8.8"]
+        remote.close()
+    finally:
+        daemon.close()
@@ -0,0 +1,36 @@
+import random
+
+from dedup import ExpiringDedup
+
+
+def test_interval_holds_across_generation_rollover():
+    dedup = ExpiringDedup(horizon=10.0)
+    assert dedup.check("a", 10.0, now=0.0)
+    assert dedup.check("b", 10.0, now=9.0)
+    assert not dedup.check("b", 10.0, now=12.0) # rotated at 12; "b" is found in the previous generation
+    assert not dedup.check("b", 10.0, now=18.9)
+    assert dedup.check("b", 10.0, now=19.0)
+    assert dedup.check("a", 10.0, now=12.0)
+
+
+def test_idle_gap_drops_both_generations():
+    dedup = ExpiringDedup(horizon=5.0)
+    for key in range(100): dedup.check(key, 5.0, now=0.0)
+    dedup.check("x", 5.0, now=3.0)
+    dedup.check("y", 5.0, now=20.0)
+    assert len(dedup) == 1 and dedup.stats()['expired'] == 101
+
+
+def test_matches_a_dict_that_never_forgets():
+    rng = random.Random(7)
+    dedup = ExpiringDedup(horizon=1.0)
+    last = {}
+    now = 0.0
+    for _ in range(20000):
+        now += rng.expovariate(20.0)
+        key = rng.randrange(50)
+        interval = rng.choice((0.5, 1.0, 3.0)) if key % 2 else 1.0 # horizon grows to 3.0 on first use
+        expected = key not in last or now - last[key] >= interval
+        if expected: last[key] = now
+        assert dedup.check(key, interval, now=now) == expected
+    assert dedup.horizon == 3.0 and dedup.stats()['expired'] > 0
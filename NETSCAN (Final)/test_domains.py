@@ -0,0 +1,51 @@
+from domains import DomainIndex
+
+
+def registrable(index, qname):
+    return index.classify(qname).registrable
+
+
+def test_multi_label_suffixes():
+    index = DomainIndex()
+    assert registrable(index, "www.bbc.co.uk") == "bbc.co.uk"
+    assert index.classify("www.bbc.co.uk").name == "Bbc"
+    assert registrable(index, "octocat.github.io") == "octocat.github.io"
+    assert registrable(index, "a.b.octocat.github.io") == "octocat.github.io"
+    assert registrable(index, "News.Example.COM.") == "example.com"
+
+
+def test_names_without_a_registrable_domain():
+    index = DomainIndex()
+    for qname in ("localhost", "router", "co.uk", "github.io", "com", "a..example.com", ""):
+        info = index.classify(qname)
+        assert (info.registrable, info.name, info.category) == (None, None, None), qname
+        assert info.risk == index.weights[None]
+
+
+def test_wildcard_and_exception_rules():
+    index = DomainIndex(["jp", "*.kawasaki.jp", "!city.kawasaki.jp"])
+    assert registrable(index, "www.example.foo.kawasaki.jp") == "example.foo.kawasaki.jp"
+    assert registrable(index, "www.city.kawasaki.jp") == "city.kawasaki.jp"
+    assert registrable(index, "example.unknowntld") == "example.unknowntld" # default rule "*"
+
+
+def test_categories_cover_subdomains_and_the_most_specific_listing_wins():
+    index = DomainIndex(categories={"vendor": ["example.com"], "tracker": ["metrics.example.com"]},
+                        weights={"tracker": 0.5})
+    assert index.classify("example.com").category == "vendor"
+    assert index.classify("cdn.example.com").category == "vendor"
+    assert index.classify("a.b.metrics.example.com").category == "tracker"
+    assert index.classify("a.b.metrics.example.com").risk == 0.5
+    assert index.classify("metrics.example.org").category is None
+    assert index.classify("notexample.com").category is None
+
+
+def test_load_reads_suffix_and_hosts_style_lists(tmp_path):
+    (tmp_path / "psl.dat").write_text("// comment\ncom\nuk\nco.uk\n", encoding="utf-8")
+    (tmp_path / "lists").mkdir()
+    (tmp_path / "lists" / "ad.txt").write_text("# ads\n0.0.0.0 ads.example.co.uk\n0.0.0.0 localhost\n", encoding="utf-8")
+    index = DomainIndex.load(str(tmp_path / "psl.dat"), str(tmp_path / "lists"))
+    assert (index.rules, index.listed) == (3, 1)
+    info = index.classify("x.ads.example.co.uk")
+    assert (info.registrable, info.category) == ("example.co.uk", "ad")
+    assert registrable(index, "user.github.io") == "github.io" # not in this list, unlike the built-in one
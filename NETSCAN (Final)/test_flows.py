@@ -0,0 +1,50 @@
+from flows import FlowTable
+
+A = ("10.0.0.2", "8.8.8.8", "udp", 5353, 53)
+B = ("10.0.0.3", "1.1.1.1", "tcp", 40000, 443)
+
+
+def table(**kwargs):
+    exported, created = [], []
+    flows = FlowTable(on_new=created.append, on_export=exported.extend, **kwargs)
+    return flows, created, exported
+
+
+def test_idle_flows_expire_oldest_first():
+    flows, created, exported = table(idle_timeout=15.0, active_timeout=60.0)
+    flows.observe(A, 0.0, 100)
+    flows.observe(B, 5.0, 60)
+    flows.observe(A, 10.0, 100)
+    assert flows.expire(19.0) == [] # A was active at 10, B at 5: neither idle for 15s yet
+    assert [r['dst'] for r in flows.expire(20.0)] == ["1.1.1.1"]
+    flows.observe(B, 26.0, 60) # a new flow for the same key; its once-a-second expiry exports A
+    assert [(r['packets'], r['bytes'], r['first'], r['last']) for r in exported] == [(1, 60, 5.0, 5.0), (2, 200, 0.0, 10.0)]
+    assert len(created) == 3 and len(flows) == 1
+
+
+def test_long_flows_are_exported_every_active_timeout():
+    flows, created, exported = table(idle_timeout=15.0, active_timeout=60.0)
+    for second in range(0, 150, 10): flows.observe(A, float(second), 1000)
+    flows.flush(everything=True)
+    assert [(r['first'], r['last'], r['packets']) for r in exported] == [(0.0, 50.0, 6), (60.0, 110.0, 6), (120.0, 140.0, 3)]
+    assert len(created) == 1 # restarted in place, not re-created
+    assert sum(r['bytes'] for r in exported) == 15 * 1000
+
+
+def test_sampling_scales_the_counted_packets():
+    flows, created, exported = table(sample_rate=4)
+    for n in range(400): flows.observe(A if n % 2 else B, n / 100, 50)
+    flows.flush(everything=True)
+    assert sum(r['packets'] for r in exported) == 400 and sum(r['bytes'] for r in exported) == 400 * 50
+    assert all(r['sampling'] == 4 for r in exported)
+    assert flows.stats()['sampled_out'] == 300
+
+
+def test_a_full_table_evicts_the_least_recent_flow():
+    flows, created, exported = table(max_flows=2)
+    flows.observe(A, 0.0, 10)
+    flows.observe(B, 0.1, 10)
+    flows.observe(A, 0.2, 10)
+    flows.observe(("10.0.0.4", "9.9.9.9", "udp", 1, 53), 0.3, 10)
+    assert len(flows) == 2 and flows.stats()['evicted'] == 1
+    assert [r['dst'] for r in flows.flush()] == ["1.1.1.1"]
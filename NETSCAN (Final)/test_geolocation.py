@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from geolocation import GeoLocator, IpApiProvider, LocationChain, LookupDeferred, RangeDatabase, ip_to_int
+
+
+def write_table(tmp_path, text):
+    path = tmp_path / "ranges.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+TABLE = (
+    "start,end,lat,lon,city\n"
+    "1.0.8.0,1.0.15.255,35.6895,139.6917,Tokyo\n"          # out of order on purpose
+    "1.0.0.0,1.0.0.255,-33.8688,151.2093,Sydney\n"
+    f"{ip_to_int('1.0.1.0')},{ip_to_int('1.0.3.255')},-37.8136,144.9631,Melbourne\n"
+    "2001:db8::,2001:db8::ffff,1.0,2.0,Nowhere\n"          # IPv6 rows are skipped
+    "1.0.4.0,not-an-ip,1.0,2.0,Broken\n"
+    "8.8.8.8,8.8.8.8,37.386,-122.0838,Mountain View\n"
+)
+
+
+def test_lookup_at_range_edges(tmp_path):
+    db = RangeDatabase(write_table(tmp_path, TABLE))
+    assert db.lookup("1.0.0.0") == (-33.8688, 151.2093, "Sydney")
+    assert db.lookup("1.0.0.255")[2] == "Sydney"
+    assert db.lookup("1.0.1.0")[2] == "Melbourne"
+    assert db.lookup("1.0.3.255")[2] == "Melbourne"
+    assert db.lookup("1.0.8.0")[2] == "Tokyo"
+    assert db.lookup("1.0.15.255")[2] == "Tokyo"
+    assert db.lookup("8.8.8.8")[2] == "Mountain View"
+    assert len(db) == 4
+
+
+def test_lookup_in_gaps_and_outside_the_table(tmp_path):
+    db = RangeDatabase(write_table(tmp_path, TABLE))
+    for ip in ("0.255.255.255", "1.0.4.0", "1.0.7.255", "1.0.16.0", "8.8.8.7", "8.8.8.9", "255.255.255.255"):
+        assert db.lookup(ip) is None, ip
+    assert db.lookup("not-an-ip") is None
+
+
+def test_dbip_layout_and_lazy_load(tmp_path):
+    db = RangeDatabase(write_table(tmp_path, "9.9.9.0,9.9.9.255,NA,US,California,Berkeley,37.8716,-122.2727\n"))
+    assert not db.loaded
+    assert db.lookup("9.9.9.9") == (37.8716, -122.2727, "Berkeley")
+    assert db.loaded
+
+
+class Fixed:
+    # Provider stub: answers from a dict, or raises `error`
+    def __init__(self, answers=None, error=None):
+        self.answers = answers or {}
+        self.error = error
+        self.calls = 0
+
+    def lookup(self, ip):
+        self.calls += 1
+        if self.error: raise self.error
+        return self.answers.get(ip)
+
+
+def test_chain_skips_an_unreadable_range_table(tmp_path):
+    errors = []
+    table = RangeDatabase(str(tmp_path / "missing.csv"))
+    online = Fixed({"8.8.8.8": (1.0, 2.0, "Online")})
+    chain = LocationChain([table, online], on_error=lambda provider, e: errors.append(provider))
+    assert chain.lookup_many(["8.8.8.8", "9.9.9.9"]) == {"8.8.8.8": (1.0, 2.0, "Online")}
+    assert chain.lookup("8.8.8.8") == (1.0, 2.0, "Online")
+    assert errors == [table] and table.failed is not None # logged once, not reloaded
+
+
+def test_chain_defers_what_a_failing_provider_left_unanswered():
+    chain = LocationChain([Fixed({"8.8.8.8": (1.0, 2.0, "Table")}), Fixed(error=OSError("offline"))])
+    with pytest.raises(LookupDeferred) as raised:
+        chain.lookup_many(["8.8.8.8", "9.9.9.9"])
+    assert raised.value.results == {"8.8.8.8": (1.0, 2.0, "Table")}
+    with pytest.raises(LookupDeferred):
+        chain.lookup("9.9.9.9")
+    assert chain.lookup("8.8.8.8") == (1.0, 2.0, "Table")
+
+
+class StandIn(BaseHTTPRequestHandler):
+    # ip-api /batch stand-in: records each batch, answers every IP ending in .13 with a failure.
+    # server.script holds (status, X-Rl, X-Ttl) for the next responses (default 200, plenty left).
+    def do_POST(self):
+        ips = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batches.append(len(ips))
+        self.server.times.append(time.monotonic())
+        status, left, ttl = self.server.script.pop(0) if self.server.script else (200, 14, 60)
+        body = b"" if status == 429 else json.dumps(
+            [{"status": "fail", "query": ip} if ip.endswith(".13") else
+             {"status": "success", "query": ip, "lat": 1.5, "lon": 2.5, "city": f"City {ip}"} for ip in ips]).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Rl", str(left))
+        self.send_header("X-Ttl", str(ttl))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def ip_api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.batches = []
+    server.times = []
+    server.script = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+IPS = [f"8.{i // 256}.{i % 256}.1" for i in range(249)] + ["8.8.8.13"]
+
+
+def test_lookup_many_posts_batches_of_100(ip_api):
+    provider = IpApiProvider(f"http://127.0.0.1:{ip_api.server_port}")
+    results = provider.lookup_many(IPS)
+    assert ip_api.batches == [100, 100, 50]
+    assert provider.requests_sent == 3
+    assert len(results) == 249 and "8.8.8.13" not in results
+    assert results["8.0.5.1"] == (1.5, 2.5, "City 8.0.5.1")
+
+
+def test_geolocator_collects_queued_ips_into_batches(ip_api):
+    provider = IpApiProvider(f"http://127.0.0.1:{ip_api.server_port}")
+    answered = []
+    done = threading.Event()
+    def on_result(ip, location):
+        answered.append(ip)
+        if len(answered) == 249: done.set()
+    geolocator = GeoLocator(provider.lookup, on_result, workers=1, resolve_many=provider.lookup_many,
+                            batch_size=100, batch_window=0.2)
+    for ip in IPS + IPS[:10]: geolocator.submit(ip) # repeats are deduplicated before the queue
+    geolocator.start()
+    assert done.wait(10)
+    geolocator.stop()
+    assert ip_api.batches == [100, 100, 50]
+    stats = geolocator.stats()
+    assert (stats['submitted'], stats['batches'], stats['resolved'], stats['failed']) == (250, 3, 249, 1)
+
+
+def wait_for(ips, provider, **kwargs):
+    # Resolves ips through a GeoLocator; returns the answered IPs and its stats
+    answered = []
+    done = threading.Event()
+    def on_result(ip, location):
+        answered.append(ip)
+        if len(answered) == len(ips): done.set()
+    geolocator = GeoLocator(provider.lookup, on_result, resolve_many=provider.lookup_many, **kwargs)
+    for ip in ips: geolocator.submit(ip)
+    geolocator.start()
+    assert done.wait(10)
+    geolocator.stop()
+    return answered, geolocator.stats()
+
+
+def test_429_pauses_until_the_window_resets(ip_api):
+    ip_api.script = [(429, 0, 1)]
+    provider = IpApiProvider(f"http://127.0.0.1:{ip_api.server_port}")
+    answered, stats = wait_for(IPS[:20], provider, workers=2, batch_window=0.05)
+    assert sorted(answered) == sorted(IPS[:20]) # kept queued, not dropped
+    assert ip_api.batches == [20, 20]
+    assert ip_api.times[1] - ip_api.times[0] >= 0.95
+    assert provider.rate_limited == 1 and stats['requeued'] == 20 and stats['failed'] == 0
+
+
+def test_no_request_once_the_window_is_used_up(ip_api):
+    ip_api.script = [(200, 0, 1)]
+    provider = IpApiProvider(f"http://127.0.0.1:{ip_api.server_port}")
+    assert len(provider.lookup_many(IPS[:100])) == 100
+    with pytest.raises(LookupDeferred) as raised:
+        provider.lookup_many(IPS[100:110])
+    assert 0 < raised.value.retry_after <= 1 and len(ip_api.batches) == 1
+    time.sleep(raised.value.retry_after)
+    assert len(provider.lookup_many(IPS[100:110])) == 10
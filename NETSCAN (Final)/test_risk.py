@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from risk import RiskIndex
+
+
+def brute_max(index, now):
+    return max((index.risk(ip, now) for ip in index.scores), default=0.0)
+
+
+@pytest.mark.parametrize("half_life", [60.0, None])
+def test_max_matches_brute_force(half_life):
+    rng = random.Random(3)
+    index = RiskIndex(half_life=half_life)
+    now = 1000.0
+    for _ in range(5000):
+        now += rng.expovariate(2.0)
+        ip = f"10.0.0.{rng.randrange(40)}"
+        op = rng.random()
+        if op < 0.7: index.add(ip, rng.choice((0.005, 0.03, 0.2)), now)
+        elif op < 0.9: index.set(ip, rng.random() * rng.choice((0.0, 1.0)), now)
+        else: index.remove(ip)
+        assert index.max(now) == pytest.approx(brute_max(index, now), rel=1e-9, abs=1e-12)
+    assert len(index.heap) <= 2 * len(index) + 65 # stale entries are compacted
+
+
+def test_add_at_the_cap():
+    index = RiskIndex(half_life=60.0)
+    assert index.add("a", 0.7, now=0.0) == pytest.approx(0.7)
+    assert index.add("a", 0.7, now=0.0) == pytest.approx(0.3) # capped at 1.0
+    heap, seq = len(index.heap), index.seq
+    assert index.add("a", 0.5, now=0.0) == 0.0
+    assert (len(index.heap), index.seq) == (heap, seq) # nothing stored for a no-op
+    assert index.add("a", 0.5, now=60.0) == pytest.approx(0.5) # halved, then back up to the cap
+    assert index.risk("a", now=60.0) == 1.0 and index.max(now=60.0) == 1.0
+
+
+def test_set_at_the_cap_and_to_zero():
+    index = RiskIndex(half_life=60.0)
+    index.set("a", 1.0, now=0.0)
+    index.set("b", 0.9, now=30.0)
+    assert index.max(now=30.0) == pytest.approx(0.9)
+    assert index.max(now=120.0) == pytest.approx(0.9 * 2 ** -1.5) # both decay at the same rate: "b" stays on top
+    index.set("b", 0.0, now=120.0)
+    assert index.max(now=120.0) == pytest.approx(0.25)
+    index.remove("a")
+    assert index.max(now=120.0) == 0.0
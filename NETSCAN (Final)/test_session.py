@@ -0,0 +1,77 @@
+import os
+import zlib
+
+import pytest
+
+from engine import AnalysisEngine
+from geolocation import GeoLocator
+from session import LOCATION_CHUNK, MAGIC, SessionStore
+
+
+def session(path, events=None, max_known=None):
+    engine = AnalysisEngine()
+    geolocator = GeoLocator(lambda ip: None, lambda ip, location: None, max_known=max_known)
+    emit = (lambda *event: events.append(event)) if events is not None else (lambda *event: None)
+    return SessionStore(str(path), engine, geolocator, emit), engine, geolocator
+
+
+def test_snapshot_round_trip(tmp_path):
+    store, engine, geolocator = session(tmp_path / "s.bin")
+    engine.update_devices("192.168.1.7", "Browsing example.com", 0.2, potential_name="Laptop", now=1000.25)
+    engine.update_devices("192.168.1.7", "Browsing example.com", 0.2, now=1001.5)
+    engine.update_devices("192.168.1.8", "SSDP NOTIFY", 0.05, now=1002.0)
+    geolocator.preload("8.8.8.8", (37.4, -122.1, "Mountain View"))
+    geolocator.preload("1.1.1.1", (-33.9, 151.2, "Sydney"))
+    store.write()
+
+    events = []
+    restored, engine2, geolocator2 = session(tmp_path / "s.bin", events)
+    restored.load()
+    assert sorted(engine2.devices) == ["192.168.1.7", "192.168.1.8"]
+    dev = engine2.devices["192.168.1.7"]
+    rec = dev.activities["Browsing example.com"]
+    assert dev.name == "Laptop" and (rec.first_seen, rec.last_seen, rec.hits) == (1000.25, 1001.5, 2)
+    assert engine2.device_risk("192.168.1.7") == pytest.approx(engine.device_risk("192.168.1.7"), rel=1e-6)
+    assert list(geolocator2.locations.items()) == list(geolocator.locations.items())
+    assert [e[1] for e in events if e[0] == "location"] == ["8.8.8.8", "1.1.1.1"]
+    assert restored.counters['restored_devices'] == 2 and restored.counters['restored_locations'] == 2
+
+
+def test_unreadable_snapshot_is_moved_aside(tmp_path):
+    path = tmp_path / "s.bin"
+    path.write_bytes(MAGIC + bytes([1]) + zlib.compress(b"old marshal records"))
+    events = []
+    store, engine, geolocator = session(path, events)
+    store.start()
+    assert store.loaded.wait(5)
+    kept = [name for name in os.listdir(tmp_path) if name.endswith(".unreadable")]
+    assert len(kept) == 1 and not path.exists()
+    assert "unsupported session format 1" in events[0][1]
+    engine.update_devices("192.168.1.7", "Browsing example.com", 0.1)
+    store.stop() # the final snapshot starts a fresh file
+    restored, engine2, _ = session(path)
+    restored.load()
+    assert list(engine2.devices) == ["192.168.1.7"]
+
+
+def test_only_changed_devices_and_location_chunks_are_re_encoded(tmp_path):
+    store, engine, geolocator = session(tmp_path / "s.bin", max_known=3 * LOCATION_CHUNK)
+    for i in range(50): engine.update_devices(f"10.0.0.{i}", "Browsing example.com", 0.01, now=1000.0)
+    for i in range(3 * LOCATION_CHUNK): geolocator.preload(f"1.2.{i // 256}.{i % 256}", (1.0, 2.0, f"City {i}"))
+    store.write()
+    assert (store.counters['encoded'], store.counters['writes']) == (50, 1)
+    chunks = dict(store.location_chunks)
+    assert sorted(chunks) == [0, 1, 2]
+
+    store.write() # nothing changed: no write at all
+    assert store.counters['writes'] == 1
+    engine.update_devices("10.0.0.3", "Browsing example.org", 0.01, now=1001.0)
+    for i in range(10): geolocator.preload(f"9.9.9.{i}", (3.0, 4.0, "New")) # evicts the oldest ten
+    store.write()
+    assert (store.counters['encoded'], store.counters['writes']) == (51, 2)
+    assert sorted(store.location_chunks) == [1, 2] and all(store.location_chunks[n] is chunks[n] for n in (1, 2))
+
+    restored, engine2, geolocator2 = session(tmp_path / "s.bin", max_known=3 * LOCATION_CHUNK)
+    restored.load()
+    assert list(geolocator2.locations.items()) == list(geolocator.locations.items())
+    assert "Browsing example.org" in engine2.devices["10.0.0.3"].activities